@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from kpis import KPI_REGISTRY, add_kpis, compute_kpis
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+CAMPAIGN_KPIS = ['roas', 'ctr', 'cpc']
+
+
+def kpi_summary(backend, start_date, end_date):
+    daily_columns = ['total_revenue', 'num_of_orders', 'new_customers']
+    totals = backend.business_summary(
+        None, start_date, end_date,
+        kpis=['total_roas', 'avg_order_value', 'gross_margin'], components=daily_columns
+    ).iloc[0]
+    daily = backend.business_summary(None, start_date, end_date, components=daily_columns, agg='mean').iloc[0]
+
+    summary = {col: float(totals[col]) for col in totals.index}
+    summary.update({f"{col}_per_day": float(daily[col]) for col in daily_columns})
+    return summary
+
+
+def platform_summary(backend, start_date, end_date, platforms=None, states=None):
+    return backend.marketing_summary(
+        'platform', start_date, end_date, platforms, states,
+        kpis=['roas', 'ctr', 'cpc'], components=['spend', 'attributed_revenue', 'clicks', 'impression']
+    )
+
+
+def tactic_summary(backend, start_date, end_date, platforms=None, states=None):
+    return backend.marketing_summary(
+        ['platform', 'tactic'], start_date, end_date, platforms, states,
+        kpis=['roas', 'ctr', 'cpc'], components=['spend', 'attributed_revenue']
+    )
+
+
+def weekly_summary(backend, start_date, end_date):
+    weekly_data = backend.business_summary(
+        'day_of_week', start_date, end_date,
+        components=['total_revenue', 'num_of_orders', 'spend', 'attributed_revenue'], agg='mean'
+    )
+    weekly_data['total_roas'] = compute_kpis(weekly_data, ['total_roas'])['total_roas']
+
+    weekly_data['day_of_week'] = pd.Categorical(weekly_data['day_of_week'], categories=DAY_ORDER, ordered=True)
+    return weekly_data.sort_values('day_of_week')
+
+
+def top_k_indices(values, k, largest=True):
+    keys = -values if largest else values
+    k = min(k, len(keys))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # argpartition selects the k best in O(n); only those k are then sorted
+    candidates = np.argpartition(keys, k - 1)[:k] if k < len(keys) else np.arange(len(keys))
+    return candidates[np.argsort(keys[candidates], kind='stable')]
+
+
+def campaign_ranking(backend, start_date, end_date, platforms=None, states=None,
+                     metric='roas', k=20, largest=True, min_spend=0.0):
+    totals = backend.campaign_summary(start_date, end_date, platforms, states)
+
+    values = (compute_kpis(totals, [metric])[metric] if metric in KPI_REGISTRY else totals[metric]).to_numpy()
+    # Campaigns below the spend floor are excluded so a few dollars of spend
+    # cannot top a ratio ranking
+    eligible = np.flatnonzero(totals['spend'].to_numpy() >= min_spend)
+    selected = eligible[top_k_indices(values[eligible], k, largest)]
+
+    ranking = add_kpis(totals.iloc[selected], CAMPAIGN_KPIS)
+    ranking.insert(0, 'rank', np.arange(1, len(ranking) + 1))
+    return ranking.reset_index(drop=True), len(eligible)
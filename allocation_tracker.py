@@ -0,0 +1,142 @@
+import argparse
+import os
+import tracemalloc
+from collections import Counter
+
+import pandas as pd
+
+from data_processor import MARKETING_SOURCES, BUSINESS_SOURCE, MarketingDataProcessor
+
+STAGES = ('clean_data', 'combine_marketing_data', 'join_data')
+SCALES = (4, 16, 64)
+
+# Peak memory allocated while a stage runs, as a multiple of the raw input
+# it reads. Ratios that grow with the scale mean a stage holds more than a
+# constant number of copies of its input.
+PEAK_BUDGETS = {
+    'clean_data': 0.75,
+    'combine_marketing_data': 1.35,
+    'join_data': 0.25,
+}
+SCALING_TOLERANCE = 1.25
+
+# Blocks a stage allocated and still holds when it returns, at least as large
+# as one full column of the smallest source. Stages hold a fixed number of
+# these, so more means a new copy of a column or frame; copies freed within
+# the stage only show up in the peak.
+# Cleaning replaces the date and four metric columns of each source,
+# combining builds the campaign dataset, and joining only holds daily totals.
+COPY_BUDGETS = {
+    'clean_data': 15,
+    'combine_marketing_data': 5,
+    'join_data': 0,
+}
+TRACEBACK_DEPTH = 25
+TOP_SITES = 3
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def scaled_sources(scale):
+    # Each replica gets its own campaigns, so rows and campaign groups grow
+    # with the scale while dates, platforms, states and tactics stay fixed
+    sources = []
+    for path in MARKETING_SOURCES.values():
+        raw = pd.read_csv(path)
+        replicas = [raw.assign(campaign=raw['campaign'] + f" #{i}") for i in range(scale)]
+        sources.append(pd.concat(replicas, ignore_index=True))
+    return sources
+
+
+def frame_bytes(frames):
+    return sum(int(frame.memory_usage(deep=True).sum()) for frame in frames)
+
+
+def column_bytes(frames):
+    # The smallest column of any source, counting object columns by their
+    # pointers, is the size of the smallest block a column copy allocates
+    return min(int(frame.memory_usage(index=False, deep=False).min()) for frame in frames)
+
+
+def allocation_site(traceback):
+    # The innermost repo frame names the line that asked for the allocation
+    # rather than the pandas or numpy internals that made it
+    for frame in reversed(traceback):
+        if frame.filename.startswith(REPO_DIR):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+    return f"{traceback[-1].filename}:{traceback[-1].lineno}"
+
+
+def stage_allocations(before, after, copy_bytes):
+    stats = [stat for stat in after.compare_to(before, 'traceback') if stat.size_diff > 0]
+    sites = Counter()
+    for stat in stats:
+        sites[allocation_site(stat.traceback)] += stat.size_diff
+    return {
+        'blocks': sum(stat.count_diff for stat in stats),
+        'bytes': sum(stat.size_diff for stat in stats),
+        'copies': sum(trace.size >= copy_bytes for trace in after.traces),
+        'sites': sites.most_common(TOP_SITES),
+    }
+
+
+def track_pipeline(scale):
+    processor = MarketingDataProcessor()
+    processor.fb_data, processor.google_data, processor.tiktok_data = scaled_sources(scale)
+    processor.business_data = pd.read_csv(BUSINESS_SOURCE)
+    sources = [processor.fb_data, processor.google_data, processor.tiktok_data]
+    input_bytes = frame_bytes(sources)
+    copy_bytes = column_bytes(sources)
+
+    peaks = {}
+    allocations = {}
+    for stage in STAGES:
+        # Tracing starts empty for each stage, so the snapshot diff only holds
+        # what the stage allocated and kept
+        tracemalloc.start(TRACEBACK_DEPTH)
+        before = tracemalloc.take_snapshot()
+        getattr(processor, stage)()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[stage] = peak / input_bytes
+        allocations[stage] = stage_allocations(before, after, copy_bytes)
+    return input_bytes, peaks, allocations
+
+
+def check_budgets(scales=SCALES):
+    results = {scale: track_pipeline(scale) for scale in scales}
+    failures = []
+
+    for scale, (input_bytes, peaks, allocations) in results.items():
+        print(f"scale {scale:>3} ({input_bytes / 1e6:.1f} MB input): " +
+              ", ".join(f"{stage} {ratio:.2f}x" for stage, ratio in peaks.items()))
+        for stage, stage_stats in allocations.items():
+            print(f"    {stage}: {stage_stats['blocks']} blocks, {stage_stats['bytes'] / 1e6:.2f} MB retained, "
+                  f"{stage_stats['copies']} column copies; top sites " +
+                  ", ".join(f"{site} {size / 1e6:.2f} MB" for site, size in stage_stats['sites']))
+        failures.extend(
+            f"{stage} peaked at {ratio:.2f}x its input at scale {scale} (budget {PEAK_BUDGETS[stage]}x)"
+            for stage, ratio in peaks.items() if ratio > PEAK_BUDGETS[stage]
+        )
+        failures.extend(
+            f"{stage} kept {stage_stats['copies']} column copies at scale {scale} (budget {COPY_BUDGETS[stage]})"
+            for stage, stage_stats in allocations.items() if stage_stats['copies'] > COPY_BUDGETS[stage]
+        )
+
+    smallest, largest = results[min(scales)][1], results[max(scales)][1]
+    failures.extend(
+        f"{stage} grew from {smallest[stage]:.2f}x to {largest[stage]:.2f}x its input as data scaled"
+        for stage in STAGES if largest[stage] > smallest[stage] * SCALING_TOLERANCE
+    )
+
+    if failures:
+        raise SystemExit("Allocation budget exceeded:\n" + "\n".join(failures))
+    print("All stages within their allocation budgets")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check pipeline peak allocations and copies stay within budget as data scales")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    args = parser.parse_args()
+
+    check_budgets(args.scales)
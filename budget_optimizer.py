@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq
+
+CELL_DIMENSIONS = ['platform', 'tactic']
+
+# Fitted elasticities are clipped to keep every curve concave (diminishing
+# returns) and away from the flat/linear extremes that give corner solutions
+MIN_ELASTICITY = 0.05
+MAX_ELASTICITY = 0.95
+DEFAULT_ELASTICITY = 0.5
+MIN_OBSERVATIONS = 7
+
+# Allocations stay within this factor of each cell's current daily spend,
+# the range where the fitted curve is backed by data
+SPEND_BOUNDS = (0.5, 2.0)
+
+
+def cell_dimensions(by_state=False):
+    return CELL_DIMENSIONS + ['state'] if by_state else list(CELL_DIMENSIONS)
+
+
+def fit_response_curves(daily, by, days):
+    # Revenue = scale * spend ** elasticity per cell, fitted as a log-log
+    # regression. Per-cell sums via bincount fit every cell in one pass.
+    cells = daily.groupby(by, observed=True, sort=True)[['spend', 'attributed_revenue']].sum()
+    cells = cells[cells['spend'] > 0] / days
+    cells.columns = ['spend', 'revenue']
+
+    active = daily[(daily['spend'] > 0) & (daily['attributed_revenue'] > 0)]
+    index = pd.MultiIndex.from_frame(active[by]) if len(by) > 1 else pd.Index(active[by[0]])
+    codes = cells.index.get_indexer(index)
+    active = active[codes >= 0]
+    codes = codes[codes >= 0]
+
+    x = np.log(active['spend'].to_numpy(dtype='float64'))
+    y = np.log(active['attributed_revenue'].to_numpy(dtype='float64'))
+    size = len(cells)
+    n = np.bincount(codes, minlength=size).astype('float64')
+    sx, sy = np.bincount(codes, x, size), np.bincount(codes, y, size)
+    sxx, sxy, syy = np.bincount(codes, x * x, size), np.bincount(codes, x * y, size), np.bincount(codes, y * y, size)
+
+    var_x = n * sxx - sx * sx
+    var_y = n * syy - sy * sy
+    cov = n * sxy - sx * sy
+    fitted = (n >= MIN_OBSERVATIONS) & (var_x > 1e-12)
+
+    elasticity = np.full(size, DEFAULT_ELASTICITY)
+    np.divide(cov, var_x, out=elasticity, where=fitted)
+    elasticity = np.clip(elasticity, MIN_ELASTICITY, MAX_ELASTICITY)
+
+    r2 = np.zeros(size)
+    np.divide(cov * cov, var_x * var_y, out=r2, where=fitted & (var_y > 1e-12))
+
+    curves = cells.reset_index()
+    curves['days'] = n.astype(int)
+    curves['elasticity'] = elasticity
+    curves['r2'] = r2
+    # Anchoring each curve at the cell's current operating point keeps the
+    # predicted revenue at today's spend equal to what was observed
+    curves['scale'] = curves['revenue'] / curves['spend'] ** elasticity
+    curves['fitted'] = fitted
+    return curves
+
+
+def fit_from_backend(backend, start_date, end_date, platforms=None, states=None, by_state=False):
+    by = cell_dimensions(by_state)
+    columns = list(dict.fromkeys(CELL_DIMENSIONS + ['state', 'spend', 'attributed_revenue']))
+    marketing = backend.marketing(start_date, end_date, platforms, states, columns=columns)
+
+    daily = marketing.groupby(['date'] + by, observed=True)[['spend', 'attributed_revenue']].sum().reset_index()
+    days = (pd.to_datetime(end_date) - pd.to_datetime(start_date)).days + 1
+    return fit_response_curves(daily, by, days)
+
+
+def _spend_at(log_lam, scale, elasticity, lower, upper):
+    # Marginal revenue scale * e * s**(e - 1) equals lambda at the optimum
+    spend = np.exp((np.log(scale * elasticity) - log_lam) / (1 - elasticity))
+    return np.clip(spend, lower, upper)
+
+
+def _solve(scale, elasticity, lower, upper, budget, warm_start=None):
+    def excess(log_lam):
+        return _spend_at(log_lam, scale, elasticity, lower, upper).sum() - budget
+
+    if len(scale) == 0 or budget <= lower.sum():
+        return np.inf
+    if budget >= upper.sum():
+        return -np.inf
+
+    # At the largest marginal return over the lower bounds every cell sits
+    # at its lower bound, at the smallest over the upper bounds every cell
+    # sits at its upper bound, so this always brackets the root
+    marginal_lower = np.log(scale * elasticity) + (elasticity - 1) * np.log(lower)
+    marginal_upper = np.log(scale * elasticity) + (elasticity - 1) * np.log(upper)
+    low, high = marginal_upper.min(), marginal_lower.max()
+
+    # The previous solution's multiplier usually moves little after a
+    # filter or budget change, so a narrow bracket around it is tried first
+    if warm_start is not None and np.isfinite(warm_start):
+        near_low, near_high = max(low, warm_start - 0.25), min(high, warm_start + 0.25)
+        if near_low < near_high and excess(near_low) >= 0 >= excess(near_high):
+            low, high = near_low, near_high
+
+    return brentq(excess, low, high, xtol=1e-10)
+
+
+def allocate_budget(curves, budget=None, bounds=SPEND_BOUNDS, warm_start=None):
+    scale = curves['scale'].to_numpy()
+    elasticity = curves['elasticity'].to_numpy()
+    current = curves['spend'].to_numpy()
+    lower, upper = current * bounds[0], current * bounds[1]
+    budget = current.sum() if budget is None else budget
+
+    # Cells with spend but no attributed revenue (scale 0) have no marginal
+    # return, so they are pinned at their lower bound and the remaining
+    # budget is solved over the cells that do return revenue
+    returning = scale > 0
+    log_lam = _solve(
+        scale[returning], elasticity[returning], lower[returning], upper[returning],
+        budget - lower[~returning].sum(), warm_start
+    )
+
+    optimal = lower.copy()
+    if np.isneginf(log_lam):
+        optimal[returning] = upper[returning]
+    elif np.isfinite(log_lam):
+        optimal[returning] = _spend_at(log_lam, scale[returning], elasticity[returning], lower[returning], upper[returning])
+
+    allocation = curves.drop(columns=['scale', 'fitted']).rename(
+        columns={'spend': 'current_spend', 'revenue': 'current_revenue'}
+    )
+    allocation['optimal_spend'] = optimal
+    allocation['optimal_revenue'] = scale * optimal ** elasticity
+    allocation['spend_change_%'] = np.where(current > 0, (optimal / current - 1) * 100, 0.0)
+    allocation['marginal_roas'] = scale * elasticity * optimal ** (elasticity - 1)
+    return allocation, float(log_lam)
+
+
+def summarize_allocation(allocation, by='platform'):
+    summary = allocation.groupby(by, observed=True, sort=True)[
+        ['current_spend', 'optimal_spend', 'current_revenue', 'optimal_revenue']
+    ].sum().reset_index()
+    summary['current_share_%'] = summary['current_spend'] / summary['current_spend'].sum() * 100
+    summary['optimal_share_%'] = summary['optimal_spend'] / summary['optimal_spend'].sum() * 100
+    summary['revenue_change_%'] = (summary['optimal_revenue'] / summary['current_revenue'] - 1) * 100
+    return summary
+
+
+def check_allocations():
+    # Synthetic cells, including one with spend but no attributed revenue,
+    # solved at budgets below, at and above current spend
+    curves = pd.DataFrame({
+        'platform': ['Facebook', 'Google', 'TikTok', 'TikTok'],
+        'tactic': ['ASC', 'Search', 'Prospecting', 'Retargeting'],
+        'spend': [1000.0, 600.0, 200.0, 150.0],
+        'revenue': [3000.0, 1500.0, 300.0, 0.0],
+        'elasticity': [0.4, 0.6, 0.5, 0.5],
+    })
+    curves['scale'] = curves['revenue'] / curves['spend'] ** curves['elasticity']
+    curves['fitted'] = True
+    lower, upper = curves['spend'] * SPEND_BOUNDS[0], curves['spend'] * SPEND_BOUNDS[1]
+    zero_revenue = curves['scale'] <= 0
+
+    for factor in (0.4, 0.8, 1.0, 1.2, 3.0):
+        budget = curves['spend'].sum() * factor
+        allocation, multiplier = allocate_budget(curves, budget)
+        optimal = allocation['optimal_spend']
+        assert np.isfinite(optimal).all(), f"non-finite allocation at {factor}x"
+        assert ((optimal >= lower - 1e-9) & (optimal <= upper + 1e-9)).all(), f"bounds violated at {factor}x"
+        assert np.allclose(optimal[zero_revenue], lower[zero_revenue]), f"zero-revenue cell not pinned at {factor}x"
+        expected = min(max(budget, lower.sum()), upper[~zero_revenue].sum() + lower[zero_revenue].sum())
+        assert np.isclose(optimal.sum(), expected), f"spent {optimal.sum():.2f} of {expected:.2f} at {factor}x"
+        print(f"{factor}x budget: spend {optimal.sum():,.2f}, predicted revenue "
+              f"{allocation['optimal_revenue'].sum():,.2f}, multiplier {multiplier:.4f}")
+    print("All allocations within bounds and budget")
+
+
+if __name__ == "__main__":
+    check_allocations()
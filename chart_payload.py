@@ -0,0 +1,92 @@
+import argparse
+
+import numpy as np
+
+DAY_MS = 86_400_000
+DATA_ARRAYS = ('x', 'y', 'values')
+
+# float32 keeps about 7 significant digits, well past what an axis tick or
+# hover label shows, at half the bytes of float64
+DISPLAY_FLOAT = 'float32'
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+def _axis_key(axis_ref):
+    # Trace axis references are 'x', 'x2', ...; layout keys are 'xaxis', 'xaxis2', ...
+    return axis_ref[0] + 'axis' + axis_ref[1:]
+
+
+def _daily_start(dates):
+    # Dates at midnight, one day apart, collapse to a start plus a step
+    days = dates.astype('datetime64[D]')
+    if len(days) < 2 or (days != dates).any() or (np.diff(days) != np.timedelta64(1, 'D')).any():
+        return None
+    return str(days[0])
+
+
+def compact_figure(fig):
+    # Rewrites trace arrays in place into what the browser needs to draw
+    # them: regular daily x values become x0/dx, other midnight dates become
+    # plain YYYY-MM-DD strings, and float arrays are sent as float32
+    for trace in fig.data:
+        for name in DATA_ARRAYS:
+            values = getattr(trace, name, None) if name in trace else None
+            if values is None or len(values) == 0:
+                continue
+            values = np.asarray(values)
+
+            if values.dtype.kind == 'M':
+                axis_ref = getattr(trace, name + 'axis', None) or name
+                fig.layout[_axis_key(axis_ref)].type = 'date'
+                start = _daily_start(values)
+                if start is not None:
+                    trace[name] = None
+                    trace[name + '0'] = start
+                    trace['d' + name] = DAY_MS
+                elif (values.astype('datetime64[D]') == values).all():
+                    trace[name] = np.datetime_as_string(values, unit='D')
+            elif values.dtype == np.float64 and np.nanmax(np.abs(values), initial=0) < FLOAT32_MAX:
+                trace[name] = values.astype(DISPLAY_FLOAT)
+    return fig
+
+
+def payload_bytes(fig):
+    # Streamlit sends plotly.io.to_json output, which is what this measures
+    return len(fig.to_json().encode('utf-8'))
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from data_storage import read_dataset, read_manifest
+    from query_backend import PandasBackend
+    import marketing_dashboard as dashboard
+
+    parser = argparse.ArgumentParser(description="Payload bytes per dashboard chart before and after compaction")
+    parser.add_argument('--days', type=int, default=None, help="Trailing window (default: full range)")
+    args = parser.parse_args()
+
+    manifest = read_manifest()
+    backend = PandasBackend(*(read_dataset(manifest, name) for name in ('business', 'marketing', 'campaigns')))
+    start, end = backend.date_bounds()
+    if args.days:
+        start = max(start, end - pd.Timedelta(days=args.days - 1))
+    platforms, states = backend.dimension_values('platform'), backend.dimension_values('state')
+
+    builders = {
+        'trends_chart': lambda: dashboard.create_revenue_trends_chart(backend, (start, end)),
+        'platform_chart': lambda: dashboard.create_platform_analysis(backend, (start, end), platforms, states)[0],
+        'tactic_chart': lambda: dashboard.create_tactic_analysis(backend, (start, end), platforms, states)[0],
+        'weekly_chart': lambda: dashboard.create_weekly_analysis(backend, (start, end))[0],
+    }
+
+    total_full = total_compact = 0
+    for name, build in builders.items():
+        fig = build()
+        full_bytes = payload_bytes(fig)
+        compact_bytes = payload_bytes(compact_figure(fig))
+        total_full += full_bytes
+        total_compact += compact_bytes
+        print(f"{name}: {full_bytes / 1024:.1f} KB -> {compact_bytes / 1024:.1f} KB")
+    print(f"total: {total_full / 1024:.1f} KB -> {total_compact / 1024:.1f} KB "
+          f"({(1 - total_compact / total_full) * 100:.0f}% smaller)")
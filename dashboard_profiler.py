@@ -0,0 +1,173 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+import streamlit as st
+
+from chart_payload import compact_figure
+
+PROFILE_ENV_VAR = 'DASHBOARD_PROFILE'
+PROFILE_QUERY_PARAM = 'debug'
+ENABLED_VALUES = ('1', 'true', 'yes', 'on', 'timing', 'cprofile')
+
+_cache_stats = {}
+
+
+def _stats_for(name):
+    return _cache_stats.setdefault(name, {'calls': 0, 'misses': 0})
+
+
+def record_cache_access(name, hit):
+    stats = _stats_for(name)
+    stats['calls'] += 1
+    if not hit:
+        stats['misses'] += 1
+
+
+def tracked_cache(name, cache=st.cache_data, **cache_kwargs):
+    # Streamlit only executes the cached body on a miss, so counting inside it
+    # gives misses while counting around the cached function gives calls
+    def decorator(func):
+        stats = _stats_for(name)
+
+        @wraps(func)
+        def on_miss(*args, **kwargs):
+            stats['misses'] += 1
+            return func(*args, **kwargs)
+
+        cached = cache(**cache_kwargs)(on_miss)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats['calls'] += 1
+            return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+def get_profile_mode():
+    try:
+        value = st.query_params.get(PROFILE_QUERY_PARAM)
+    except Exception:
+        value = None
+    if not value:
+        value = os.getenv(PROFILE_ENV_VAR, '')
+    value = str(value).strip().lower()
+    return value if value in ENABLED_VALUES else None
+
+
+class DashboardProfiler:
+    def __init__(self, enabled=False, capture_cprofile=False):
+        self.enabled = enabled
+        self.sections = []
+        self.payloads = []
+        self._cache_baseline = {name: dict(stats) for name, stats in _cache_stats.items()}
+        self._started = time.perf_counter()
+        self._cprofile = None
+
+        if enabled and capture_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @classmethod
+    def from_request(cls):
+        mode = get_profile_mode()
+        return cls(enabled=mode is not None, capture_cprofile=mode == 'cprofile')
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sections.append({'section': name, 'seconds': elapsed})
+
+    def record_payload(self, name, num_bytes):
+        if self.enabled:
+            self.payloads.append({'element': name, 'bytes': int(num_bytes)})
+
+    def plotly_chart(self, name, fig, **kwargs):
+        # Every chart leaves through here, so this is where figures are
+        # compacted to the payload the browser needs
+        fig = compact_figure(fig)
+        if not self.enabled:
+            st.plotly_chart(fig, **kwargs)
+            return
+
+        with self.section(f'serialize: {name}'):
+            payload = fig.to_json()
+        self.record_payload(name, len(payload.encode('utf-8')))
+
+        with self.section(f'render: {name}'):
+            st.plotly_chart(fig, **kwargs)
+
+    def dataframe(self, name, df, **kwargs):
+        if self.enabled:
+            self.record_payload(name, df.memory_usage(deep=True).sum())
+        st.dataframe(df, **kwargs)
+
+    def _cprofile_dump(self):
+        self._cprofile.disable()
+        self._cprofile.create_stats()
+        dump = marshal.dumps(self._cprofile.stats)
+
+        report = io.StringIO()
+        pstats.Stats(self._cprofile, stream=report).sort_stats('cumulative').print_stats(25)
+        return dump, report.getvalue()
+
+    def render(self):
+        if not self.enabled:
+            return
+
+        total = time.perf_counter() - self._started
+
+        with st.expander("⏱️ Profiling (this rerun)", expanded=True):
+            st.write(f"**Total rerun time:** {total * 1000:.1f} ms")
+
+            if self.sections:
+                sections = pd.DataFrame(self.sections)
+                sections['ms'] = (sections['seconds'] * 1000).round(1)
+                sections['share_%'] = (sections['seconds'] / total * 100).round(1)
+                st.dataframe(sections[['section', 'ms', 'share_%']], use_container_width=True)
+
+            if _cache_stats:
+                rows = []
+                for name, stats in _cache_stats.items():
+                    baseline = self._cache_baseline.get(name, {'calls': 0, 'misses': 0})
+                    rows.append({
+                        'cache': name,
+                        'rerun_calls': stats['calls'] - baseline['calls'],
+                        'rerun_misses': stats['misses'] - baseline['misses'],
+                        'total_calls': stats['calls'],
+                        'hit_rate_%': round((1 - stats['misses'] / stats['calls']) * 100, 1) if stats['calls'] else 0.0
+                    })
+                st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+            if self.payloads:
+                payloads = pd.DataFrame(self.payloads)
+                payloads['KB'] = (payloads['bytes'] / 1024).round(1)
+                st.dataframe(payloads, use_container_width=True)
+                st.write(f"**Total payload:** {payloads['bytes'].sum() / 1024:,.1f} KB")
+
+            if self._cprofile is not None:
+                dump, report = self._cprofile_dump()
+                st.download_button(
+                    "Download cProfile dump (.pstats)",
+                    data=dump,
+                    file_name=f"dashboard_rerun_{int(time.time())}.pstats",
+                    mime="application/octet-stream"
+                )
+                st.text(report)
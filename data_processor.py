@@ -1,31 +1,79 @@
+import argparse
+import os
+
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from kpis import MARKETING_COMPONENTS, BUSINESS_COMPONENTS
+from data_storage import (
+    IncompatibleSnapshot, get_partition_grain, get_snapshot_keep, read_dataset, read_manifest, write_snapshot
+)
+from rolling_stats import PLATFORM_METRICS, TOTAL_METRICS, add_rolling_stats
+import lazy_engine
+from tenants import tenant_paths
+from verifyData import verify_data_files
+
+MARKETING_SOURCES = {
+    'Facebook': 'Data/Facebook.csv',
+    'Google': 'Data/Google.csv',
+    'TikTok': 'Data/TikTok.csv'
+}
+BUSINESS_SOURCE = 'Data/business.csv'
+# Summed float components are rounded to this many decimals. Engines add in
+# different orders (pandas uses compensated sums) and disagree in the last
+# bits; rounding well above that noise makes their outputs, and so the
+# snapshot version, identical.
+SUM_DECIMALS = 4
+
+def tenant_sources(tenant=None):
+    # Every tenant supplies the same files in its own data directory
+    data_dir = tenant_paths(tenant).data_dir
+    marketing = {platform: os.path.join(data_dir, os.path.basename(path)) for platform, path in MARKETING_SOURCES.items()}
+    return marketing, os.path.join(data_dir, os.path.basename(BUSINESS_SOURCE))
+
 class MarketingDataProcessor:
-    def __init__(self):
+    def __init__(self, tenant=None):
+        self.tenant = tenant
+        self.marketing_sources, self.business_source = tenant_sources(tenant)
+        self.root = tenant_paths(tenant).root
         self.fb_data = None
         self.google_data = None
         self.tiktok_data = None
         self.business_data = None
         self.combined_marketing = None
+        self.campaign_data = None
+        self.platform_daily = None
         self.final_data = None
+        self.previous_outputs = {}
         
     def load_data(self):
         print("Loading data...")
-        self.fb_data = pd.read_csv('Data/Facebook.csv')
-        self.google_data = pd.read_csv('Data/Google.csv')
-        self.tiktok_data = pd.read_csv('Data/TikTok.csv')
-        self.business_data = pd.read_csv('Data/business.csv')
+        self.fb_data, self.google_data, self.tiktok_data = (
+            pd.read_csv(path) for path in self.marketing_sources.values()
+        )
+        self.business_data = pd.read_csv(self.business_source)
         print("Data loaded successfully!")
+    
+    def load_previous_outputs(self, root=None):
+        # The published snapshot lets join_data reuse rolling statistics for
+        # days that have not changed instead of recomputing the full history
+        try:
+            manifest = read_manifest(root or self.root)
+        except (FileNotFoundError, IncompatibleSnapshot):
+            return
+        
+        self.previous_outputs = {
+            name: read_dataset(manifest, name)
+            for name in ('business', 'platform_daily') if name in manifest['datasets']
+        }
         
     def clean_data(self):
         print("Cleaning data...")
         
         marketing_dfs = [self.fb_data, self.google_data, self.tiktok_data]
-        platform_names = ['Facebook', 'Google', 'TikTok']
+        platform_names = list(self.marketing_sources)
         
         for i, df in enumerate(marketing_dfs):
             df['date'] = pd.to_datetime(df['date'])
@@ -34,8 +82,7 @@ class MarketingDataProcessor:
             
             df.columns = df.columns.str.replace(' ', '_')
             
-            numeric_cols = ['impression', 'clicks', 'spend', 'attributed_revenue']
-            for col in numeric_cols:
+            for col in MARKETING_COMPONENTS:
                 if col in df.columns:
                     df[col] = pd.to_numeric(df[col], errors='coerce')
         
@@ -45,8 +92,7 @@ class MarketingDataProcessor:
         self.business_data.columns = self.business_data.columns.str.replace('# of new orders', 'num_of_new_orders')
         self.business_data.columns = self.business_data.columns.str.replace(' ', '_')
         
-        numeric_cols = ['num_of_orders', 'num_of_new_orders', 'new_customers', 'total_revenue', 'gross_profit', 'COGS']
-        for col in numeric_cols:
+        for col in BUSINESS_COMPONENTS:
             if col in self.business_data.columns:
                 self.business_data[col] = pd.to_numeric(self.business_data[col], errors='coerce')
         
@@ -55,99 +101,140 @@ class MarketingDataProcessor:
     def combine_marketing_data(self):
         print("Combining marketing data...")
         
-        self.combined_marketing = pd.concat([
-            self.fb_data,
-            self.google_data, 
-            self.tiktok_data
-        ], ignore_index=True)
-        
-        self.combined_marketing = self.combined_marketing.groupby([
-            'date', 'platform', 'state', 'tactic'
-        ]).agg({
-            'impression': 'sum',
-            'clicks': 'sum', 
-            'spend': 'sum',
-            'attributed_revenue': 'sum'
-        }).reset_index()
+        # Platform is a group key, so no group spans two sources: each source
+        # is aggregated on its own rows, in their original order, and only the
+        # small per-source results are concatenated
+        sources = dict(zip(self.marketing_sources, [self.fb_data, self.google_data, self.tiktok_data]))
+        campaigns, marketing = [], []
+        for platform, df in sources.items():
+            keys = [df['date'], df['state'], df['tactic']]
+            campaigns.append(self._platform_totals(df, keys + [df['campaign']], platform))
+            marketing.append(self._platform_totals(df, keys, platform))
+        
+        # Campaigns are kept in their own dataset so the platform-level data
+        # the dashboard charts from stays small however many campaigns run
+        self.campaign_data = pd.concat(campaigns, ignore_index=True).sort_values(
+            ['date', 'platform', 'state', 'tactic', 'campaign'], ignore_index=True
+        )
+        self.campaign_data['campaign'] = self.campaign_data['campaign'].astype('category')
+        self.combined_marketing = pd.concat(marketing, ignore_index=True).sort_values(
+            ['date', 'platform', 'state', 'tactic'], ignore_index=True
+        )
         
         print("Marketing data combined successfully!")
         
-    def create_metrics(self):
-        print("Creating metrics and KPIs...")
-        
-        self.combined_marketing['ctr'] = (self.combined_marketing['clicks'] / self.combined_marketing['impression'] * 100).round(2)
-        self.combined_marketing['cpc'] = (self.combined_marketing['spend'] / self.combined_marketing['clicks']).round(2)
-        self.combined_marketing['roas'] = (self.combined_marketing['attributed_revenue'] / self.combined_marketing['spend']).round(2)
-        self.combined_marketing['cpm'] = (self.combined_marketing['spend'] / self.combined_marketing['impression'] * 1000).round(2)
-        
-        self.business_data['avg_order_value'] = (self.business_data['total_revenue'] / self.business_data['num_of_orders']).round(2)
-        self.business_data['customer_acquisition_cost'] = 0  # Will be calculated after joining
-        self.business_data['gross_margin'] = ((self.business_data['gross_profit'] / self.business_data['total_revenue']) * 100).round(2)
-        self.business_data['new_customer_rate'] = ((self.business_data['new_customers'] / self.business_data['num_of_orders']) * 100).round(2)
-        
-        print("Metrics created successfully!")
+    @staticmethod
+    def _platform_totals(df, keys, platform):
+        totals = df[MARKETING_COMPONENTS].groupby(keys, sort=True).sum().reset_index()
+        totals.insert(1, 'platform', platform)
+        return totals
         
     def join_data(self):
         print("Joining marketing and business data...")
         
-        daily_marketing = self.combined_marketing.groupby('date').agg({
-            'impression': 'sum',
-            'clicks': 'sum',
-            'spend': 'sum', 
-            'attributed_revenue': 'sum'
-        }).reset_index()
-        
-        self.final_data = pd.merge(
-            self.business_data, 
-            daily_marketing, 
-            on='date', 
-            how='left'
+        # Only additive components are stored; ratios such as ROAS and CTR are
+        # derived from summed components at read time via kpis.py
+        daily_marketing = self.combined_marketing.groupby('date')[MARKETING_COMPONENTS].sum()
+        platform_daily = self.combined_marketing.groupby(['date', 'platform'])[MARKETING_COMPONENTS].sum()
+        
+        # Aligning the daily totals onto the business dates is the left join;
+        # days without marketing get 0 directly instead of NaN then fillna
+        dates = self.business_data['date']
+        daily_marketing = daily_marketing.reindex(dates, fill_value=0)
+        self.final_data = self.business_data.assign(
+            **{col: daily_marketing[col].to_numpy() for col in MARKETING_COMPONENTS},
+            day_of_week=dates.dt.day_name(),
+            week=dates.dt.isocalendar().week,
+            month=dates.dt.month
         )
         
-        marketing_cols = ['impression', 'clicks', 'spend', 'attributed_revenue']
-        for col in marketing_cols:
-            self.final_data[col] = self.final_data[col].fillna(0)
+        # Reindexed onto the full calendar so rolling windows count days, not rows
+        calendar = pd.date_range(dates.min(), dates.max(), name='date')
+        platforms = pd.Index(sorted(self.combined_marketing['platform'].unique()), name='platform')
+        self.platform_daily = platform_daily.reindex(
+            pd.MultiIndex.from_product([calendar, platforms]), fill_value=0
+        ).reset_index()
         
-        self.final_data['total_roas'] = np.where(
-            self.final_data['spend'] > 0,
-            self.final_data['attributed_revenue'] / self.final_data['spend'],
-            0
-        ).round(2)
-        
-        self.final_data['marketing_contribution'] = (
-            self.final_data['attributed_revenue'] / self.final_data['total_revenue'] * 100
-        ).round(2)
+        print("Data joining completed!")
         
-        self.final_data['total_ctr'] = np.where(
-            self.final_data['impression'] > 0,
-            self.final_data['clicks'] / self.final_data['impression'] * 100,
-            0
-        ).round(2)
+    def round_sums(self):
+        for name in ('final_data', 'combined_marketing', 'campaign_data', 'platform_daily'):
+            df = getattr(self, name)
+            for col in MARKETING_COMPONENTS:
+                if df[col].dtype.kind == 'f':
+                    df[col] = df[col].round(SUM_DECIMALS)
         
-        self.final_data['day_of_week'] = self.final_data['date'].dt.day_name()
-        self.final_data['week'] = self.final_data['date'].dt.isocalendar().week
-        self.final_data['month'] = self.final_data['date'].dt.month
+    def add_statistics(self):
+        self.final_data = add_rolling_stats(
+            self.final_data, TOTAL_METRICS, previous=self.previous_outputs.get('business')
+        )
+        self.platform_daily = add_rolling_stats(
+            self.platform_daily, PLATFORM_METRICS, by=['platform'], previous=self.previous_outputs.get('platform_daily')
+        )
         
-        print("Data joining completed!")
+    def process_lazy(self):
+        # One lazy plan replaces load/clean/combine/join; the per-source frames
+        # are never materialized
+        print("Processing data with the polars lazy engine...")
+        self.final_data, self.combined_marketing, self.campaign_data, self.platform_daily = lazy_engine.build_outputs(
+            self.marketing_sources, self.business_source
+        )
         
-    def process_all(self):
-        self.load_data()
-        self.clean_data()
-        self.combine_marketing_data()
-        self.create_metrics()
-        self.join_data()
+    def process_all(self, engine=None):
+        engine = engine or lazy_engine.get_engine_name()
+        self.load_previous_outputs()
+        if engine == 'polars':
+            self.process_lazy()
+        else:
+            self.load_data()
+            self.clean_data()
+            self.combine_marketing_data()
+            self.join_data()
+        self.round_sums()
+        self.add_statistics()
         
         print("Data processing completed successfully!")
         print(f"Final dataset shape: {self.final_data.shape}")
         print(f"Combined marketing data shape: {self.combined_marketing.shape}")
+        print(f"Campaign data shape: {self.campaign_data.shape}")
         
         return self.final_data, self.combined_marketing
+    
+    def save_outputs(self, root=None, grain=None, keep=None):
+        root = root or self.root
+        grain = grain or get_partition_grain()
+        keep = keep or get_snapshot_keep()
+        print(f"Saving outputs partitioned by {grain}...")
+        
+        manifest = write_snapshot({
+            'business': self.final_data,
+            'marketing': self.combined_marketing,
+            'campaigns': self.campaign_data,
+            'platform_daily': self.platform_daily
+        }, root=root, grain=grain, keep=keep)
+        
+        partition_count = sum(len(dataset['partitions']) for dataset in manifest['datasets'].values())
+        print(f"Wrote {partition_count} partitions to snapshot {manifest['snapshot']}")
+        return manifest
 
 if __name__ == "__main__":
-    processor = MarketingDataProcessor()
-    final_data, marketing_data = processor.process_all()
+    # Imported here: it loads the Gemini client and Streamlit secrets, which
+    # tools importing the processor (allocation_tracker, lazy_engine) do not need
+    from insight_prewarm import prewarm_insights
+
+    parser = argparse.ArgumentParser(description="Process marketing and business data into a published snapshot")
+    parser.add_argument('--tenant', default=None, help="Process tenants/<tenant>/Data into tenants/<tenant>/processed")
+    args = parser.parse_args()
+    
+    processor = MarketingDataProcessor(args.tenant)
+    if not verify_data_files([processor.business_source, *processor.marketing_sources.values()]):
+        raise SystemExit("Input validation failed. Fix the errors above before processing.")
+    
+    processor.process_all()
+    processor.save_outputs()
     
-    final_data.to_csv('processed_business_data.csv', index=False)
-    marketing_data.to_csv('processed_marketing_data.csv', index=False)
+    print("Processed data snapshot published!")
     
-    print("Processed data saved to CSV files!")
+    # Insights for the standard date ranges are stored for the snapshot so
+    # the dashboard can serve them without waiting on Gemini
+    prewarm_insights(processor.root)
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+PROCESSED_ROOT = 'processed'
+MANIFEST_FILE = 'manifest.json'
+SNAPSHOTS_DIR = 'snapshots'
+CURRENT_FILE = 'CURRENT'
+GRAIN_ENV_VAR = 'PARTITION_GRAIN'
+DEFAULT_GRAIN = 'month'
+KEEP_ENV_VAR = 'SNAPSHOT_KEEP'
+DEFAULT_KEEP = 5
+
+# Bumped whenever the datasets or columns readers rely on change; readers
+# only accept snapshots written in the current format
+FORMAT_VERSION = 2
+
+GRAINS = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M',
+    'quarter': 'Q',
+    'year': 'Y'
+}
+
+DIMENSION_COLUMNS = ['platform', 'state', 'tactic']
+
+
+class IncompatibleSnapshot(ValueError):
+    pass
+
+# High-cardinality labels that are dictionary-encoded on read
+CATEGORICAL_COLUMNS = ['campaign']
+
+
+def get_partition_grain():
+    grain = os.getenv(GRAIN_ENV_VAR, DEFAULT_GRAIN).strip().lower()
+    if grain not in GRAINS:
+        raise ValueError(f"Unsupported partition grain '{grain}'. Use one of: {', '.join(GRAINS)}")
+    return grain
+
+
+def get_snapshot_keep():
+    return max(1, int(os.getenv(KEEP_ENV_VAR, DEFAULT_KEEP)))
+
+
+def _write_json(path, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_partitioned_dataset(df, root, name, grain=DEFAULT_GRAIN):
+    dataset_dir = os.path.join(root, name)
+    if os.path.exists(dataset_dir):
+        shutil.rmtree(dataset_dir)
+    os.makedirs(dataset_dir)
+
+    partitions = []
+    periods = df['date'].dt.to_period(GRAINS[grain])
+
+    for period, partition in df.groupby(periods, sort=True):
+        key = period.start_time.strftime('%Y-%m-%d')
+        path = f"{name}/{key}.csv"
+        content = partition.to_csv(index=False)
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(content)
+
+        partitions.append({
+            'key': key,
+            'path': path,
+            'hash': hashlib.sha256(content.encode('utf-8')).hexdigest()[:16],
+            'min_date': partition['date'].min().strftime('%Y-%m-%d'),
+            'max_date': partition['date'].max().strftime('%Y-%m-%d'),
+            'rows': int(len(partition))
+        })
+
+    return {
+        'columns': list(df.columns),
+        'rows': int(len(df)),
+        'partitions': partitions
+    }
+
+
+def write_partitioned_outputs(datasets, root=PROCESSED_ROOT, grain=DEFAULT_GRAIN):
+    os.makedirs(root, exist_ok=True)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'grain': grain,
+        'datasets': {},
+        'dimensions': {}
+    }
+
+    for name, df in datasets.items():
+        manifest['datasets'][name] = write_partitioned_dataset(df, root, name, grain)
+
+        for col in DIMENSION_COLUMNS:
+            if col in df.columns and col not in manifest['dimensions']:
+                manifest['dimensions'][col] = df[col].dropna().unique().tolist()
+
+    all_partitions = [p for dataset in manifest['datasets'].values() for p in dataset['partitions']]
+    manifest['min_date'] = min(p['min_date'] for p in all_partitions)
+    manifest['max_date'] = max(p['max_date'] for p in all_partitions)
+
+    # The version only depends on partition contents, so re-running the
+    # pipeline on unchanged inputs keeps the same version
+    version_source = json.dumps([FORMAT_VERSION, grain] + [p['path'] + p['hash'] for p in all_partitions])
+    manifest['version'] = hashlib.sha256(version_source.encode('utf-8')).hexdigest()[:12]
+
+    _write_json(os.path.join(root, MANIFEST_FILE), manifest)
+    return manifest
+
+
+def snapshot_path(root, snapshot_id):
+    return os.path.join(root, SNAPSHOTS_DIR, snapshot_id)
+
+
+def list_snapshots(root=PROCESSED_ROOT):
+    snapshots_dir = os.path.join(root, SNAPSHOTS_DIR)
+    if not os.path.isdir(snapshots_dir):
+        return []
+    # Ids start with a timestamp, so name order is creation order
+    return sorted(
+        name for name in os.listdir(snapshots_dir)
+        if not name.startswith('.') and os.path.exists(os.path.join(snapshots_dir, name, MANIFEST_FILE))
+    )
+
+
+def current_snapshot(root=PROCESSED_ROOT):
+    with open(os.path.join(root, CURRENT_FILE)) as f:
+        return f.read().strip()
+
+
+def publish_snapshot(snapshot_id, root=PROCESSED_ROOT):
+    if not os.path.exists(os.path.join(snapshot_path(root, snapshot_id), MANIFEST_FILE)):
+        raise FileNotFoundError(f"Snapshot {snapshot_id} not found in {root}")
+    # Readers resolve the pointer once per load, so swapping it is the only
+    # step that needs to be atomic
+    _write_atomic(os.path.join(root, CURRENT_FILE), snapshot_id + '\n')
+
+
+def prune_snapshots(root=PROCESSED_ROOT, keep=DEFAULT_KEEP):
+    current = current_snapshot(root)
+    snapshots = list_snapshots(root)
+    removed = []
+    for snapshot_id in snapshots[:-keep]:
+        if snapshot_id != current:
+            shutil.rmtree(snapshot_path(root, snapshot_id))
+            removed.append(snapshot_id)
+    return removed
+
+
+def write_snapshot(datasets, root=PROCESSED_ROOT, grain=DEFAULT_GRAIN, keep=DEFAULT_KEEP):
+    snapshots_dir = os.path.join(root, SNAPSHOTS_DIR)
+    os.makedirs(snapshots_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    staging = os.path.join(snapshots_dir, f".staging-{timestamp}-{os.getpid()}")
+    manifest = write_partitioned_outputs(datasets, root=staging, grain=grain)
+
+    if os.path.exists(os.path.join(root, CURRENT_FILE)):
+        current = load_manifest(root, current_snapshot(root))
+        if current['version'] == manifest['version']:
+            shutil.rmtree(staging)
+            print(f"Outputs unchanged; snapshot {current['snapshot']} stays current")
+            return current
+
+    # The snapshot only becomes visible under its final name once complete
+    snapshot_id = f"{timestamp}-{manifest['version']}"
+    os.rename(staging, snapshot_path(root, snapshot_id))
+
+    publish_snapshot(snapshot_id, root)
+    prune_snapshots(root, keep)
+
+    manifest['snapshot'] = snapshot_id
+    return manifest
+
+
+def snapshot_is_compatible(root, snapshot_id):
+    return load_manifest(root, snapshot_id).get('format') == FORMAT_VERSION
+
+
+def rollback_snapshot(root=PROCESSED_ROOT, snapshot_id=None):
+    if snapshot_id is None:
+        current = current_snapshot(root)
+        older = [s for s in list_snapshots(root) if s < current and snapshot_is_compatible(root, s)]
+        if not older:
+            raise ValueError(f"No earlier snapshot in format {FORMAT_VERSION} to roll back to")
+        snapshot_id = older[-1]
+    else:
+        check_format(load_manifest(root, snapshot_id))
+
+    publish_snapshot(snapshot_id, root)
+    return snapshot_id
+
+
+def manifest_signature(root=PROCESSED_ROOT):
+    stat = os.stat(os.path.join(root, CURRENT_FILE))
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_manifest(root, snapshot_id):
+    snapshot_root = snapshot_path(root, snapshot_id)
+    with open(os.path.join(snapshot_root, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    manifest['root'] = snapshot_root
+    manifest['snapshot'] = snapshot_id
+    return manifest
+
+
+def check_format(manifest):
+    found = manifest.get('format', 'unversioned')
+    if found != FORMAT_VERSION:
+        raise IncompatibleSnapshot(
+            f"Snapshot {manifest['snapshot']} is in format {found}, but format {FORMAT_VERSION} is required. "
+            f"Re-run data_processor.py or roll back to a snapshot in the current format."
+        )
+    return manifest
+
+
+def read_manifest(root=PROCESSED_ROOT):
+    return check_format(load_manifest(root, current_snapshot(root)))
+
+
+def overlapping_partitions(manifest, name, start=None, end=None):
+    start = pd.to_datetime(start).strftime('%Y-%m-%d') if start is not None else None
+    end = pd.to_datetime(end).strftime('%Y-%m-%d') if end is not None else None
+
+    # ISO date strings compare in date order, so pruning needs no parsing
+    return [
+        p for p in manifest['datasets'][name]['partitions']
+        if (start is None or p['max_date'] >= start) and (end is None or p['min_date'] <= end)
+    ]
+
+
+def read_partition(root, partition):
+    # round_trip parsing reads back exactly the floats that were written, so
+    # values reused from a snapshot match a fresh computation bit for bit
+    df = pd.read_csv(os.path.join(root, partition['path']), float_precision='round_trip')
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def _encode_categoricals(df):
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def empty_dataset(manifest, name):
+    df = pd.DataFrame(columns=manifest['datasets'][name]['columns'])
+    df['date'] = pd.to_datetime(df['date'])
+    return _encode_categoricals(df)
+
+
+def read_dataset(manifest, name, start=None, end=None, read=read_partition, trim=True):
+    partitions = overlapping_partitions(manifest, name, start, end)
+    if not partitions:
+        return empty_dataset(manifest, name)
+
+    df = pd.concat([read(manifest['root'], p) for p in partitions], ignore_index=True)
+
+    # trim=False keeps the overlapping partitions whole
+    if not trim:
+        return _encode_categoricals(df)
+    if start is not None:
+        df = df[df['date'] >= pd.to_datetime(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.to_datetime(end)]
+    return _encode_categoricals(df)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'list':
+        current = current_snapshot()
+        for snapshot_id in list_snapshots():
+            compatible = '' if snapshot_is_compatible(PROCESSED_ROOT, snapshot_id) else ' (incompatible format)'
+            print(f"{'*' if snapshot_id == current else ' '} {snapshot_id}{compatible}")
+    elif command == 'rollback':
+        try:
+            target = rollback_snapshot(snapshot_id=sys.argv[2] if len(sys.argv) > 2 else None)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"Published snapshot {target}")
+    else:
+        raise SystemExit("Usage: python data_storage.py [list | rollback [snapshot_id]]")
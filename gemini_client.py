@@ -0,0 +1,177 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+from google.api_core import exceptions as api_exceptions
+
+ATTEMPT_TIMEOUT_ENV_VAR = 'GEMINI_TIMEOUT_SECONDS'
+DEADLINE_ENV_VAR = 'GEMINI_DEADLINE_SECONDS'
+DEFAULT_ATTEMPT_TIMEOUT = 12.0
+DEFAULT_DEADLINE = 25.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 4.0
+
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 60.0
+LATENCY_SAMPLES = 200
+
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+)
+
+# Calls run on worker threads so the caller can stop waiting at the deadline
+# even if the underlying request ignores its own timeout
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gemini')
+
+
+class GeminiUnavailable(RuntimeError):
+    pass
+
+
+def _env_seconds(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Exactly one probe goes through; everyone else keeps getting
+                # the fallback until it reports back
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class CallMetrics:
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.counts = {'calls': 0, 'successes': 0, 'failures': 0, 'timeouts': 0, 'retries': 0, 'short_circuited': 0}
+        self.latencies = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self.counts)
+            latencies = np.array(self.latencies)
+        if len(latencies):
+            snapshot['p50_seconds'] = float(np.percentile(latencies, 50))
+            snapshot['p95_seconds'] = float(np.percentile(latencies, 95))
+            snapshot['max_seconds'] = float(latencies.max())
+        return snapshot
+
+
+# Shared by every session in the process, so one degraded upstream trips a
+# single breaker instead of each session discovering it separately
+breaker = CircuitBreaker()
+metrics = CallMetrics()
+
+
+def generate_content(model, prompt, attempt_timeout=None, deadline=None):
+    attempt_timeout = attempt_timeout or _env_seconds(ATTEMPT_TIMEOUT_ENV_VAR, DEFAULT_ATTEMPT_TIMEOUT)
+    deadline = deadline or _env_seconds(DEADLINE_ENV_VAR, DEFAULT_DEADLINE)
+
+    metrics.count('calls')
+    if not breaker.allow():
+        metrics.count('short_circuited')
+        raise GeminiUnavailable("Gemini circuit is open after repeated failures")
+
+    started = time.monotonic()
+    error = None
+    try:
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = deadline - (time.monotonic() - started)
+            timeout = min(attempt_timeout, remaining)
+            if timeout <= 0:
+                break
+
+            future = _executor.submit(
+                model.generate_content, prompt, request_options={'timeout': timeout, 'retry': None}
+            )
+            try:
+                response = future.result(timeout=timeout)
+            except FutureTimeout:
+                future.cancel()
+                metrics.count('timeouts')
+                error = TimeoutError(f"Gemini call exceeded {timeout:.1f}s")
+            except RETRYABLE_ERRORS as e:
+                error = e
+            except Exception:
+                # Errors such as a bad key or unknown model are answered by a
+                # healthy upstream; they are not retried and do not trip the breaker
+                breaker.record_success()
+                metrics.count('failures')
+                raise
+            else:
+                breaker.record_success()
+                metrics.count('successes')
+                return response
+
+            # Full jitter keeps sessions that failed together from retrying together
+            backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if attempt == MAX_ATTEMPTS - 1 or time.monotonic() - started + backoff >= deadline:
+                break
+            metrics.count('retries')
+            time.sleep(backoff)
+
+        breaker.record_failure()
+        metrics.count('failures')
+        raise GeminiUnavailable(f"Gemini unavailable: {error}")
+    finally:
+        metrics.observe(time.monotonic() - started)
+
+
+def status():
+    snapshot = metrics.snapshot()
+    snapshot['circuit'] = breaker.state
+    return snapshot
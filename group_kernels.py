@@ -0,0 +1,153 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+AGGREGATIONS = ('sum', 'mean')
+SPARSE_FACTOR = 4
+
+
+def code_dtype(size):
+    # The smallest signed integer holding -1 through size, so cached codes of
+    # low-cardinality columns take one or two bytes a row instead of eight
+    return np.min_scalar_type(-size - 1)
+
+
+def encode(values):
+    # Integer codes into sorted uniques, so code order is groupby(sort=True)
+    # order; missing values get -1 and are dropped like groupby's dropna
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(code_dtype(len(uniques)), copy=False), pd.Index(uniques)
+
+
+def group_index(codes):
+    # Mixed-radix combination of per-column codes: one id per combination,
+    # ordered lexicographically like the sorted group keys. Rows with a
+    # missing key get the id one past the last group.
+    sizes = [len(uniques) for _, uniques in codes]
+    ids = np.zeros(len(codes[0][0]), dtype=np.intp)
+    missing = np.zeros(len(ids), dtype=bool)
+    for column_codes, uniques in codes:
+        ids *= len(uniques)
+        ids += column_codes
+        missing |= column_codes < 0
+
+    # When the key space is much larger than the data (e.g. date x campaign)
+    # the combinations that occur are renumbered densely so the bincount
+    # tables stay proportional to the rows
+    combinations = None
+    if np.prod(sizes, dtype=np.float64) > max(len(ids), 1) * SPARSE_FACTOR:
+        combinations, dense = np.unique(ids[~missing], return_inverse=True)
+        ids[~missing] = dense
+    spare = int(np.prod(sizes)) if combinations is None else len(combinations)
+    ids[missing] = spare
+    return ids.astype(code_dtype(spare), copy=False), [uniques for _, uniques in codes], sizes, combinations
+
+
+def date_span(dates, start, end):
+    # On date-sorted data a date filter is a contiguous slice, so the rows can
+    # be used as views instead of being copied through a mask
+    return slice(
+        np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side='left'),
+        np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side='right')
+    )
+
+
+def _sums(bins, values, size):
+    if values.dtype.kind == 'f':
+        missing = np.isnan(values)
+        if missing.any():
+            present = np.bincount(bins[~missing], minlength=size + 1)[:size]
+            return np.bincount(bins, np.where(missing, 0.0, values), size + 1)[:size], present
+    return np.bincount(bins, values, size + 1)[:size], None
+
+
+def aggregate(df, by, columns, agg='sum', mask=None, index=None, span=slice(None)):
+    # mask applies to the rows selected by span
+    if agg not in AGGREGATIONS:
+        filtered = df.iloc[span] if mask is None else df.iloc[span][mask]
+        if by:
+            return filtered.groupby(by, observed=True, sort=True)[columns].agg(agg).reset_index()
+        return filtered[columns].agg(agg).to_frame().T
+
+    if not by:
+        filtered = df.iloc[span] if mask is None else df.iloc[span][mask]
+        return pd.DataFrame({col: [getattr(filtered[col], agg)()] for col in columns})
+
+    ids, uniques, sizes, combinations = index or group_index([encode(df[col]) for col in by])
+    size = int(np.prod(sizes)) if combinations is None else len(combinations)
+    # Filtered-out rows go to the spare bin past the last group
+    bins = ids[span] if mask is None else np.where(mask, ids[span], size)
+
+    counts = np.bincount(bins, minlength=size + 1)[:size]
+    observed = np.flatnonzero(counts)
+
+    result = {
+        col: col_uniques.take(column_codes)
+        for col, col_uniques, column_codes in zip(
+            by, uniques, np.unravel_index(observed if combinations is None else combinations[observed], sizes)
+        )
+    }
+    for col in columns:
+        values = df[col].to_numpy()[span]
+        sums, present = _sums(bins, values, size)
+        sums = sums[observed]
+        if agg == 'mean':
+            result[col] = sums / (counts[observed] if present is None else present[observed])
+        elif values.dtype.kind in 'iub':
+            # bincount accumulates in float64, exact for integer sums below 2**53
+            result[col] = sums.astype('int64')
+        else:
+            result[col] = sums
+    return pd.DataFrame(result)
+
+
+def _benchmark_frame(rows):
+    from data_storage import read_dataset, read_manifest
+
+    marketing = read_dataset(read_manifest(), 'marketing')
+    repeats = -(-rows // len(marketing))
+    frame = pd.concat([marketing] * repeats, ignore_index=True).iloc[:rows]
+    frame = frame.sort_values('date', kind='stable', ignore_index=True)
+    frame['day_of_week'] = frame['date'].dt.day_name()
+    return frame
+
+
+def benchmark(rows=2_000_000, repeat=5):
+    from kpis import MARKETING_COMPONENTS
+
+    frame = _benchmark_frame(rows)
+    # A 90-day window, the typical dashboard selection
+    end = frame['date'].max()
+    start = end - pd.Timedelta(days=89)
+
+    for by in (['platform'], ['platform', 'tactic'], ['day_of_week'], ['date', 'platform', 'state', 'tactic']):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            mask = ((frame['date'] >= start) & (frame['date'] <= end)).to_numpy()
+            expected = frame[mask].groupby(by, observed=True, sort=True)[MARKETING_COMPONENTS].sum().reset_index()
+        pandas_time = (time.perf_counter() - started) / repeat
+
+        # Codes are computed once per loaded dataset, so they are not timed
+        index = group_index([encode(frame[col]) for col in by])
+        started = time.perf_counter()
+        for _ in range(repeat):
+            actual = aggregate(frame, by, MARKETING_COMPONENTS, 'sum', index=index,
+                               span=date_span(frame['date'].to_numpy(), start, end))
+        kernel_time = (time.perf_counter() - started) / repeat
+
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+        print(f"{' x '.join(by)}: pandas {pandas_time * 1000:.1f} ms, kernels {kernel_time * 1000:.1f} ms "
+              f"({pandas_time / kernel_time:.1f}x) on {rows:,} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time integer-coded group-bys against pandas groupby")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark(args.rows, args.repeat)
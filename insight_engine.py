@@ -0,0 +1,270 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from budget_optimizer import allocate_budget, fit_from_backend, summarize_allocation
+
+Insight = namedtuple('Insight', ['title', 'facts', 'markdown'])
+
+# Relative ROAS thresholds (vs the overall ROAS of the selection) for
+# tactic and day-of-week recommendations
+SCALE_THRESHOLD = 1.10
+REDUCE_THRESHOLD = 0.90
+PLATFORM_SPREAD_THRESHOLD = 0.15
+CONCENTRATION_THRESHOLD = 50.0
+DECLINE_THRESHOLD = -5.0
+
+
+def _efficiency(roas):
+    return 'Strong' if roas > 2.5 else 'Moderate' if roas > 2.0 else 'Needs improvement'
+
+
+def _period(start_date, end_date):
+    return f"{pd.to_datetime(start_date).strftime('%Y-%m-%d')} to {pd.to_datetime(end_date).strftime('%Y-%m-%d')}"
+
+
+def _finite(value):
+    return value is not None and bool(np.isfinite(value))
+
+
+def _change(value):
+    # Week-over-week and 28-day statistics are NaN until enough history exists
+    return f"{value:+.1f}%" if _finite(value) else "n/a"
+
+
+def _bullets(items):
+    return '\n'.join(f"- {item}" for item in items)
+
+
+def _relative_actions(relative):
+    return np.select(
+        [relative >= SCALE_THRESHOLD, relative <= REDUCE_THRESHOLD],
+        ['Scale', 'Reduce'], default='Maintain'
+    )
+
+
+def _recent_trend(backend, start_date, end_date):
+    trends = backend.business(
+        start_date, end_date,
+        columns=['total_revenue_wow', 'spend_wow', 'total_roas_wow', 'total_roas_ma28',
+                 'total_revenue_ma7', 'total_revenue_z', 'total_revenue_anomaly',
+                 'spend_anomaly', 'total_roas_anomaly', 'total_roas_z', 'spend_z']
+    )
+    return trends.reset_index(drop=True)
+
+
+def performance_insights(backend, start_date, end_date, platforms=None, states=None):
+    totals = aggregates.kpi_summary(backend, start_date, end_date)
+    platform = aggregates.platform_summary(backend, start_date, end_date, platforms, states)
+    tactic = aggregates.tactic_summary(backend, start_date, end_date, platforms, states)
+    trends = _recent_trend(backend, start_date, end_date)
+
+    roas = totals['total_roas']
+    facts = {
+        'period': _period(start_date, end_date),
+        'total_revenue': totals['total_revenue'],
+        'spend': totals['spend'],
+        'total_roas': roas,
+        'num_of_orders': totals['num_of_orders'],
+        'avg_order_value': totals['avg_order_value'],
+        'gross_margin': totals['gross_margin']
+    }
+
+    risks = []
+    recommendations = []
+
+    if len(platform):
+        ranked = platform.sort_values('roas', ascending=False)
+        best, worst = ranked.iloc[0], ranked.iloc[-1]
+        spend_share = platform['spend'].to_numpy() / max(platform['spend'].sum(), 1e-9) * 100
+        facts.update({'best_platform': best['platform'], 'best_platform_roas': best['roas'],
+                      'worst_platform': worst['platform'], 'worst_platform_roas': worst['roas']})
+
+        if worst['roas'] > 0 and best['roas'] / worst['roas'] - 1 > PLATFORM_SPREAD_THRESHOLD:
+            recommendations.append(
+                f"Shift budget from {worst['platform']} ({worst['roas']:.2f}x) toward {best['platform']} "
+                f"({best['roas']:.2f}x); see the Budget Optimizer for the response-curve allocation"
+            )
+        if len(platform) > 1 and spend_share.max() > CONCENTRATION_THRESHOLD:
+            risks.append(
+                f"{platform['platform'].iloc[int(spend_share.argmax())]} takes {spend_share.max():.0f}% of spend "
+                f"- high platform concentration"
+            )
+
+    if len(tactic):
+        relative = tactic['roas'].to_numpy() / roas if roas > 0 else np.ones(len(tactic))
+        share = tactic['spend'].to_numpy() / max(tactic['spend'].sum(), 1e-9) * 100
+        weakest = int(np.argmin(np.where(share >= 10, relative, np.inf))) if (share >= 10).any() else None
+        strongest = int(np.argmax(relative))
+
+        recommendations.append(
+            f"Scale {tactic['platform'].iloc[strongest]} {tactic['tactic'].iloc[strongest]} "
+            f"({tactic['roas'].iloc[strongest]:.2f}x ROAS)"
+        )
+        if weakest is not None and relative[weakest] <= REDUCE_THRESHOLD:
+            recommendations.append(
+                f"Review {tactic['platform'].iloc[weakest]} {tactic['tactic'].iloc[weakest]}: "
+                f"{share[weakest]:.0f}% of spend at {tactic['roas'].iloc[weakest]:.2f}x ROAS"
+            )
+
+    if len(trends):
+        latest = trends.iloc[-1]
+        facts.update({
+            name: latest[col] for name, col in (('revenue_wow', 'total_revenue_wow'), ('roas_wow', 'total_roas_wow'))
+            if _finite(latest[col])
+        })
+        if _finite(latest['total_revenue_wow']) and latest['total_revenue_wow'] < DECLINE_THRESHOLD:
+            risks.append(f"Revenue is down {latest['total_revenue_wow']:.1f}% week over week")
+        anomaly_days = int(trends['total_revenue_anomaly'].astype(bool).sum())
+        if anomaly_days:
+            risks.append(f"{anomaly_days} day(s) with anomalous revenue in this range")
+
+    if not risks:
+        risks.append("No platform concentration, revenue decline or anomalies detected")
+
+    markdown = '\n\n'.join([
+        f"**Performance Summary** ({facts['period']})",
+        f"**Metrics:** Revenue: ${totals['total_revenue']:,.0f} | Spend: ${totals['spend']:,.0f} | "
+        f"ROAS: {roas:.2f}x | Orders: {totals['num_of_orders']:,.0f} | AOV: ${totals['avg_order_value']:.0f}",
+        f"**Efficiency:** {_efficiency(roas)} (${roas:.2f} revenue per $1 spent, "
+        f"{totals['gross_margin']:.1f}% gross margin)",
+        "**Recommendations:**\n\n" + _bullets(recommendations[:3] or ["Maintain the current mix"]),
+        "**Risks & opportunities:**\n\n" + _bullets(risks)
+    ])
+    return Insight('Performance Summary', facts, markdown)
+
+
+def trend_insights(backend, start_date, end_date):
+    trends = _recent_trend(backend, start_date, end_date)
+    weekly = aggregates.weekly_summary(backend, start_date, end_date)
+    facts = {'period': _period(start_date, end_date)}
+    sections = [f"**Trend Analysis** ({facts['period']})"]
+
+    if len(trends):
+        latest = trends.iloc[-1]
+        recent = {
+            'revenue_wow': latest['total_revenue_wow'],
+            'spend_wow': latest['spend_wow'],
+            'roas_wow': latest['total_roas_wow'],
+            'roas_28d': latest['total_roas_ma28']
+        }
+        facts.update({name: value for name, value in recent.items() if _finite(value)})
+
+        # Slope of the 7-day average, as a weekly rate relative to its mean
+        smoothed = trends['total_revenue_ma7'].to_numpy(dtype='float64')
+        valid = np.isfinite(smoothed)
+        direction = 'flat'
+        if valid.sum() >= 7:
+            slope = np.polyfit(np.flatnonzero(valid), smoothed[valid], 1)[0]
+            weekly_rate = slope * 7 / smoothed[valid].mean() * 100
+            facts['revenue_trend_per_week'] = weekly_rate
+            direction = 'rising' if weekly_rate > 1 else 'falling' if weekly_rate < -1 else 'flat'
+            sections.append(f"**Direction:** Revenue is {direction} ({weekly_rate:+.1f}% per week on the 7-day average)")
+
+        # Ranges within the first weeks of history have no prior week to compare to
+        if any(_finite(value) for value in recent.values()):
+            roas_28d = f"{recent['roas_28d']:.2f}x" if _finite(recent['roas_28d']) else "n/a"
+            sections.append(
+                f"**Last 7 days vs prior week:** Revenue {_change(recent['revenue_wow'])} | "
+                f"Spend {_change(recent['spend_wow'])} | ROAS {_change(recent['roas_wow'])} "
+                f"(28-day ROAS {roas_28d})"
+            )
+
+        anomalies = []
+        for metric, label in (('total_revenue', 'Revenue'), ('spend', 'Spend'), ('total_roas', 'ROAS')):
+            flagged = trends[f'{metric}_anomaly'].astype(bool).to_numpy()
+            for day, z in zip(trends.loc[flagged, 'date'], trends.loc[flagged, f'{metric}_z']):
+                anomalies.append(f"{label} {'spike' if z > 0 else 'drop'} on {day.strftime('%Y-%m-%d')} (z = {z:+.1f})")
+        facts['anomalies'] = anomalies
+        sections.append("**Anomalies:**\n\n" + _bullets(anomalies or ["None detected"]))
+
+    timing = []
+    if len(weekly):
+        mean_revenue = weekly['total_revenue'].mean()
+        mean_roas = weekly['total_roas'].mean()
+        best = weekly.loc[weekly['total_revenue'].idxmax()]
+        worst = weekly.loc[weekly['total_revenue'].idxmin()]
+        facts.update({'best_day': best['day_of_week'], 'worst_day': worst['day_of_week']})
+
+        timing.append(
+            f"Revenue peaks on {best['day_of_week']} ({(best['total_revenue'] / mean_revenue - 1) * 100:+.0f}% vs average) "
+            f"and is lowest on {worst['day_of_week']} ({(worst['total_revenue'] / mean_revenue - 1) * 100:+.0f}%)"
+        )
+
+        relative = weekly['total_roas'].to_numpy() / mean_roas if mean_roas > 0 else np.ones(len(weekly))
+        actions = _relative_actions(relative)
+        scale_days = weekly['day_of_week'][actions == 'Scale'].astype(str).tolist()
+        reduce_days = weekly['day_of_week'][actions == 'Reduce'].astype(str).tolist()
+        if scale_days:
+            timing.append(f"Weight spend toward {', '.join(scale_days)} (ROAS ≥{(SCALE_THRESHOLD - 1) * 100:.0f}% above average)")
+        if reduce_days:
+            timing.append(f"Pull back on {', '.join(reduce_days)} (ROAS ≥{(1 - REDUCE_THRESHOLD) * 100:.0f}% below average)")
+        if not scale_days and not reduce_days:
+            timing.append("ROAS is even across the week; no day-parting change needed")
+
+    sections.append("**Timing:**\n\n" + _bullets(timing or ["Not enough data for day-of-week patterns"]))
+    return Insight('Trend Analysis', facts, '\n\n'.join(sections))
+
+
+def platform_insights(backend, start_date, end_date, platforms=None, states=None, allocation=None):
+    platform = aggregates.platform_summary(backend, start_date, end_date, platforms, states)
+    tactic = aggregates.tactic_summary(backend, start_date, end_date, platforms, states)
+    facts = {'period': _period(start_date, end_date)}
+    sections = [f"**Platform Recommendations** ({facts['period']})"]
+
+    if len(platform) == 0:
+        sections.append("No marketing activity for this selection.")
+        return Insight('Platform Recommendations', facts, '\n\n'.join(sections))
+
+    ranked = platform.sort_values('roas', ascending=False).reset_index(drop=True)
+    share = ranked['spend'].to_numpy() / max(ranked['spend'].sum(), 1e-9) * 100
+    facts['ranking'] = ranked['platform'].astype(str).tolist()
+    sections.append("**Ranking (by ROAS):**\n\n" + '\n'.join(
+        f"{i + 1}. {row.platform}: {row.roas:.2f}x ROAS, {row.ctr:.2f}% CTR, ${row.cpc:.2f} CPC, {s:.0f}% of spend"
+        for i, (row, s) in enumerate(zip(ranked.itertuples(index=False), share))
+    ))
+
+    if allocation is None:
+        allocation = allocate_budget(fit_from_backend(backend, start_date, end_date, platforms, states))[0]
+    if len(allocation):
+        plan = summarize_allocation(allocation)
+        facts['budget_plan'] = plan.set_index('platform')[['current_share_%', 'optimal_share_%']].round(1).to_dict('index')
+        sections.append("**Budget reallocation (same total spend):**\n\n" + _bullets(
+            f"{p}: {current:.0f}% → {optimal:.0f}% of spend"
+            for p, current, optimal in zip(plan['platform'], plan['current_share_%'], plan['optimal_share_%'])
+        ))
+
+        lift = allocation['optimal_revenue'].sum() / max(allocation['current_revenue'].sum(), 1e-9) - 1
+        facts['predicted_lift_%'] = lift * 100
+        growing = allocation[allocation['spend_change_%'] > 0].nlargest(3, 'marginal_roas')
+        sections.append("**Scaling opportunities:**\n\n" + _bullets(
+            [f"{p} {t}: +{change:.0f}% spend at {marginal:.2f}x marginal ROAS"
+             for p, t, change, marginal in zip(growing['platform'], growing['tactic'],
+                                               growing['spend_change_%'], growing['marginal_roas'])]
+            or ["No cell has headroom within the optimizer's spend bounds"]
+        ) + f"\n\nPredicted attributed revenue change: {lift * 100:+.1f}%")
+
+    overall = platform['attributed_revenue'].sum() / max(platform['spend'].sum(), 1e-9)
+    relative = tactic['roas'].to_numpy() / overall if overall > 0 else np.ones(len(tactic))
+    actions = _relative_actions(relative)
+    facts['tactic_actions'] = {
+        f"{p} {t}": a for p, t, a in zip(tactic['platform'].astype(str), tactic['tactic'].astype(str), actions)
+    }
+    sections.append("**Tactic optimizations:**\n\n" + _bullets(
+        f"{action}: {p} {t} ({r:.2f}x ROAS)"
+        for action, p, t, r in sorted(
+            zip(actions, tactic['platform'].astype(str), tactic['tactic'].astype(str), tactic['roas']),
+            key=lambda item: -item[3]
+        ) if action != 'Maintain'
+    ) or "- All tactics are within 10% of the overall ROAS")
+
+    risks = []
+    if len(ranked) > 1 and share.max() > CONCENTRATION_THRESHOLD:
+        risks.append(f"{ranked['platform'].iloc[int(share.argmax())]} holds {share.max():.0f}% of spend; diversify to limit platform risk")
+    low_ctr = ranked[ranked['ctr'] < ranked['ctr'].mean() * 0.5]
+    risks.extend(f"{p} CTR ({c:.2f}%) is under half the average; refresh creative" for p, c in zip(low_ctr['platform'], low_ctr['ctr']))
+    sections.append("**Risk mitigation:**\n\n" + _bullets(risks or ["No concentration or engagement risks detected"]))
+
+    return Insight('Platform Recommendations', facts, '\n\n'.join(sections))
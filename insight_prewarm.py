@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from ai_insights import AIInsightsGenerator
+from data_storage import PROCESSED_ROOT, _write_json, list_snapshots, read_dataset, read_manifest
+from query_backend import PandasBackend
+
+INSIGHTS_DIR = 'insights'
+CONCURRENCY_ENV_VAR = 'PREWARM_CONCURRENCY'
+DEFAULT_CONCURRENCY = 4
+
+# Window name -> trailing days ending at the last date (None = full range)
+STANDARD_WINDOWS = {
+    'full': None,
+    'last_7_days': 7,
+    'last_30_days': 30,
+    'last_90_days': 90,
+}
+
+
+def get_concurrency():
+    return max(1, int(os.getenv(CONCURRENCY_ENV_VAR, DEFAULT_CONCURRENCY)))
+
+
+def insight_key(kind, start_date, end_date, platforms=None):
+    # Performance and trend insights only depend on the dates; platform
+    # recommendations also depend on the platform selection (all states)
+    key = [kind, pd.to_datetime(start_date).strftime('%Y-%m-%d'), pd.to_datetime(end_date).strftime('%Y-%m-%d')]
+    if kind == 'platforms':
+        key.append(','.join(sorted(platforms)))
+    return '|'.join(key)
+
+
+def standard_windows(min_date, max_date):
+    windows = {}
+    for name, days in STANDARD_WINDOWS.items():
+        start = min_date if days is None else max(min_date, max_date - pd.Timedelta(days=days - 1))
+        windows[name] = (start, max_date)
+    return windows
+
+
+def standard_tasks(backend):
+    min_date, max_date = backend.date_bounds()
+    platforms = backend.dimension_values('platform')
+    selections = [platforms] + [[platform] for platform in platforms]
+
+    tasks = {}
+    for start, end in dict.fromkeys(standard_windows(min_date, max_date).values()):
+        tasks[insight_key('performance', start, end)] = ('performance', start, end, None)
+        tasks[insight_key('trends', start, end)] = ('trends', start, end, None)
+        for selection in selections:
+            tasks[insight_key('platforms', start, end, selection)] = ('platforms', start, end, selection)
+    return tasks
+
+
+def generate_insight(generator, backend, kind, start_date, end_date, platforms=None, use_llm=True):
+    date_range = (start_date, end_date)
+    if kind == 'performance':
+        return generator.generate_performance_summary(backend, date_range, use_llm=use_llm)
+    if kind == 'trends':
+        return generator.generate_trend_analysis(backend, date_range, use_llm=use_llm)
+    return generator.generate_platform_recommendations(backend, date_range, platforms, use_llm=use_llm)
+
+
+def _generate_entry(generator, backend, task):
+    local = generate_insight(generator, backend, *task, use_llm=False)
+    if not generator.is_configured:
+        return {'text': local, 'source': 'local'}
+    # A failed Gemini call returns the local analysis plus a note, which is
+    # stored as local so the next run retries it
+    text = generate_insight(generator, backend, *task)
+    return {'text': text, 'source': 'local' if text.startswith(local) else 'gemini'}
+
+
+def insights_path(root, snapshot_id):
+    # Stored beside the snapshots rather than in one, so a published snapshot
+    # is never written to after it goes live
+    return os.path.join(root, INSIGHTS_DIR, f"{snapshot_id}.json")
+
+
+def load_insights(manifest, root=PROCESSED_ROOT):
+    try:
+        with open(insights_path(root, manifest['snapshot'])) as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return stored if stored.get('version') == manifest['version'] else None
+
+
+def prune_insights(root=PROCESSED_ROOT):
+    # Insights of snapshots that were pruned can never be served again
+    insights_dir = os.path.join(root, INSIGHTS_DIR)
+    snapshots = set(list_snapshots(root))
+    removed = []
+    for name in os.listdir(insights_dir):
+        snapshot_id, ext = os.path.splitext(name)
+        if ext == '.json' and snapshot_id not in snapshots:
+            os.remove(os.path.join(insights_dir, name))
+            removed.append(snapshot_id)
+    return removed
+
+
+def prewarm_insights(root=PROCESSED_ROOT, concurrency=None, force=False, generator=None):
+    manifest = read_manifest(root)
+    if generator is None:
+        generator = AIInsightsGenerator()
+        generator.initialize()
+    source = 'gemini' if generator.is_configured else 'local'
+
+    backend = PandasBackend(*(read_dataset(manifest, name) for name in ('business', 'marketing', 'campaigns')))
+    tasks = standard_tasks(backend)
+
+    # Re-runs on an unchanged snapshot keep stored insights and only fill in
+    # what is missing, or what fell back to local while Gemini is available
+    stored = {} if force else (load_insights(manifest, root) or {}).get('insights', {})
+    insights = {key: entry for key, entry in stored.items() if key in tasks and entry['source'] in (source, 'gemini')}
+    pending = {key: task for key, task in tasks.items() if key not in insights}
+    if not pending:
+        print(f"Insights for snapshot {manifest['snapshot']} are up to date")
+        return
+
+    # Gemini calls dominate the run time; the pool bounds how many are in
+    # flight at once so a batch does not trip rate limits
+    concurrency = concurrency or get_concurrency()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='prewarm') as executor:
+        futures = {key: executor.submit(_generate_entry, generator, backend, task) for key, task in pending.items()}
+        insights.update((key, future.result()) for key, future in futures.items())
+
+    os.makedirs(os.path.join(root, INSIGHTS_DIR), exist_ok=True)
+    _write_json(insights_path(root, manifest['snapshot']), {
+        'version': manifest['version'],
+        'snapshot': manifest['snapshot'],
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'insights': insights
+    })
+    prune_insights(root)
+    enhanced = sum(entry['source'] == 'gemini' for entry in insights.values())
+    print(f"Generated {len(pending)} insights for snapshot {manifest['snapshot']} "
+          f"({enhanced} of {len(insights)} stored insights are AI-enhanced)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate insights for the standard date ranges")
+    parser.add_argument('--root', default=PROCESSED_ROOT)
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Regenerate even if insights are stored")
+    args = parser.parse_args()
+
+    prewarm_insights(args.root, args.concurrency, args.force)
@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+KPI = namedtuple('KPI', ['numerator', 'denominator', 'scale'])
+
+MARKETING_COMPONENTS = ['impression', 'clicks', 'spend', 'attributed_revenue']
+BUSINESS_COMPONENTS = ['num_of_orders', 'num_of_new_orders', 'new_customers', 'total_revenue', 'gross_profit', 'COGS']
+
+# Every KPI is a scaled ratio of two additive columns. Only the components are
+# stored; ratios are derived after summing, so any rollup is a ratio of sums.
+KPI_REGISTRY = {
+    'ctr': KPI('clicks', 'impression', 100),
+    'cpc': KPI('spend', 'clicks', 1),
+    'roas': KPI('attributed_revenue', 'spend', 1),
+    'cpm': KPI('spend', 'impression', 1000),
+    'avg_order_value': KPI('total_revenue', 'num_of_orders', 1),
+    'gross_margin': KPI('gross_profit', 'total_revenue', 100),
+    'new_customer_rate': KPI('new_customers', 'num_of_orders', 100),
+    'customer_acquisition_cost': KPI('spend', 'new_customers', 1),
+    'marketing_contribution': KPI('attributed_revenue', 'total_revenue', 100),
+    'total_roas': KPI('attributed_revenue', 'spend', 1),
+    'total_ctr': KPI('clicks', 'impression', 100),
+}
+
+def kpi_components(names):
+    components = []
+    for name in names:
+        kpi = KPI_REGISTRY[name]
+        for col in (kpi.numerator, kpi.denominator):
+            if col not in components:
+                components.append(col)
+    return components
+
+
+def compute_kpis(df, names):
+    kpis = [KPI_REGISTRY[name] for name in names]
+
+    numerators = df[[kpi.numerator for kpi in kpis]].to_numpy(dtype='float64')
+    denominators = df[[kpi.denominator for kpi in kpis]].to_numpy(dtype='float64')
+    scales = np.array([kpi.scale for kpi in kpis], dtype='float64')
+
+    # One pass over all KPIs; zero or missing denominators give 0 instead of inf/NaN
+    values = np.zeros(numerators.shape, dtype='float64')
+    np.divide(numerators * scales, denominators, out=values, where=denominators > 0)
+
+    return pd.DataFrame(values, columns=list(names), index=df.index)
+
+
+def add_kpis(df, names):
+    return pd.concat([df, compute_kpis(df, names)], axis=1)
+
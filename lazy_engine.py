@@ -0,0 +1,171 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from kpis import BUSINESS_COMPONENTS, MARKETING_COMPONENTS
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+ENGINE_ENV_VAR = 'PROCESSING_ENGINE'
+ENGINES = ('pandas', 'polars')
+
+MARKETING_KEYS = ['date', 'platform', 'state', 'tactic']
+CAMPAIGN_KEYS = MARKETING_KEYS + ['campaign']
+
+
+def get_engine_name():
+    name = os.getenv(ENGINE_ENV_VAR, 'pandas').strip().lower()
+    if name not in ENGINES:
+        name = 'pandas'
+    if name == 'polars' and pl is None:
+        print("polars is not installed; processing with pandas")
+        name = 'pandas'
+    return name
+
+
+def _business_name(name):
+    return name.replace('# of orders', 'num_of_orders').replace('# of new orders', 'num_of_new_orders').replace(' ', '_')
+
+
+def _numeric(frame, components):
+    # Same coercion as pd.to_numeric(errors='coerce'): text columns become
+    # floats with nulls, already-numeric columns keep their type
+    schema = frame.collect_schema()
+    return frame.with_columns([
+        pl.col(col).cast(pl.Float64, strict=False) for col in components
+        if col in schema and schema[col] == pl.String
+    ])
+
+
+def _scan_marketing(platform, path):
+    frame = pl.scan_csv(path).rename(lambda name: name.replace(' ', '_'))
+    frame = _numeric(frame, MARKETING_COMPONENTS)
+    # Only the columns the outputs need are read from the file
+    return frame.select(
+        pl.col('date').str.to_datetime(time_unit='us'),
+        pl.lit(platform).alias('platform'),
+        'state', 'tactic', 'campaign', *MARKETING_COMPONENTS
+    )
+
+
+def _scan_business(path):
+    frame = pl.scan_csv(path).rename(_business_name)
+    frame = _numeric(frame, BUSINESS_COMPONENTS)
+    return frame.with_columns(pl.col('date').str.to_datetime(time_unit='us'))
+
+
+def build_plans(marketing_sources, business_source):
+    marketing = pl.concat(
+        [_scan_marketing(platform, path) for platform, path in marketing_sources.items()], how='vertical_relaxed'
+    )
+    components = pl.col(MARKETING_COMPONENTS).sum()
+
+    campaigns = marketing.group_by(CAMPAIGN_KEYS).agg(components).sort(CAMPAIGN_KEYS)
+    combined = marketing.group_by(MARKETING_KEYS).agg(components).sort(MARKETING_KEYS)
+    daily = combined.group_by('date').agg(components)
+
+    final = (
+        _scan_business(business_source)
+        .join(daily, on='date', how='left')
+        .with_columns(pl.col(MARKETING_COMPONENTS).fill_null(0))
+        .with_columns(
+            pl.col('date').dt.strftime('%A').alias('day_of_week'),
+            pl.col('date').dt.week().cast(pl.UInt32).alias('week'),
+            pl.col('date').dt.month().cast(pl.Int32).alias('month')
+        )
+        .sort('date')
+    )
+
+    # Full calendar x platform grid so rolling windows count days, not rows
+    calendar = final.select(
+        pl.datetime_range(pl.col('date').min(), pl.col('date').max(), '1d', time_unit='us').alias('date')
+    )
+    platform_daily = (
+        calendar.join(combined.select('platform').unique(), how='cross')
+        .join(combined.group_by(['date', 'platform']).agg(components), on=['date', 'platform'], how='left')
+        .with_columns(pl.col(MARKETING_COMPONENTS).fill_null(0))
+        .sort(['date', 'platform'])
+    )
+    return final, combined, campaigns, platform_daily
+
+
+def _to_pandas(frame):
+    # Column-wise numpy conversion avoids a pyarrow dependency
+    df = pd.DataFrame({name: frame.get_column(name).to_numpy() for name in frame.columns})
+    for col in ('platform', 'state', 'tactic', 'day_of_week'):
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    if 'campaign' in df.columns:
+        df['campaign'] = df['campaign'].astype('category')
+    return df
+
+
+def build_outputs(marketing_sources, business_source):
+    # collect_all runs the four plans together, so the shared scans and
+    # aggregations are computed once across polars' thread pool
+    frames = pl.collect_all(build_plans(marketing_sources, business_source))
+    return tuple(_to_pandas(frame) for frame in frames)
+
+
+def _run(engine):
+    from data_processor import MarketingDataProcessor
+
+    processor = MarketingDataProcessor()
+    started = time.perf_counter()
+    processor.process_all(engine)
+    elapsed = time.perf_counter() - started
+    outputs = {
+        'business': processor.final_data,
+        'marketing': processor.combined_marketing,
+        'campaigns': processor.campaign_data,
+        'platform_daily': processor.platform_daily
+    }
+    return outputs, elapsed
+
+
+def _content_version(outputs):
+    from data_storage import write_partitioned_outputs
+
+    with tempfile.TemporaryDirectory() as root:
+        return write_partitioned_outputs(outputs, root=root)['version']
+
+
+def compare_engines(repeat=5):
+    if pl is None:
+        raise SystemExit("polars is not installed; pip install polars to compare engines")
+
+    results = {engine: [_run(engine) for _ in range(repeat)] for engine in ENGINES}
+    expected, actual = results['pandas'][0][0], results['polars'][0][0]
+
+    # Values must match exactly; only in-memory dtypes such as nullable vs
+    # plain integers may differ, since they are written the same way
+    for name in expected:
+        pd.testing.assert_frame_equal(
+            actual[name].reset_index(drop=True), expected[name].reset_index(drop=True),
+            check_dtype=False, check_categorical=False, check_exact=True
+        )
+        print(f"{name}: {len(expected[name]):,} rows identical")
+
+    versions = {engine: _content_version(runs[0][0]) for engine, runs in results.items()}
+    if versions['pandas'] != versions['polars']:
+        raise SystemExit(f"Engines wrote different content versions: {versions}")
+    print(f"Both engines write content version {versions['pandas']}")
+
+    for engine, runs in results.items():
+        timings = np.array([elapsed for _, elapsed in runs])
+        print(f"{engine}: best {timings.min() * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms over {repeat} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the polars engine against pandas and time both")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    compare_engines(args.repeat)
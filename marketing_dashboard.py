@@ -9,6 +9,21 @@ import warnings
 warnings.filterwarnings('ignore')
 
 from ai_insights import AIInsightsGenerator
+from insight_prewarm import insight_key, load_insights
+import gemini_client
+from dashboard_profiler import DashboardProfiler, record_cache_access, tracked_cache
+from data_storage import IncompatibleSnapshot
+from data_watcher import DataWatcher
+from shared_dataset import attach_or_publish, unlink_version
+import aggregates
+from budget_optimizer import allocate_budget, fit_from_backend, summarize_allocation
+from kpis import add_kpis
+from query_backend import (
+    PandasBackend, PartitionedBackend, SQLiteBackend, build_sqlite_database, get_backend_name, sqlite_database_is_stale
+)
+from tenants import (
+    TENANT_QUERY_PARAM, DatasetCache, get_default_tenant, load_backend, load_shared_backend, tenant_paths, validate_tenant
+)
 
 st.set_page_config(
     page_title="Marketing Intelligence Dashboard",
@@ -55,80 +70,135 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
+# Bounds the tenant-keyed result caches however many tenants are served
+TENANT_CACHE_ENTRIES = 256
+
+@st.cache_resource
+def get_data_watcher(tenant=None):
+    # One watcher per process and tenant: it polls the manifest in the
+    # background and swaps in a new, pre-warmed data version when a pipeline
+    # run lands
+    watcher = DataWatcher(tenant_paths(tenant).root)
+    if get_backend_name() == 'shared':
+        watcher.on_change(lambda old, new: unlink_version(old['version'], tenant))
+    return watcher
+
+def release_tenant(tenant, entry):
+    # An evicted tenant stops polling, and in shared mode its segment is
+    # unlinked so the host frees it once the last attached process drops
+    # it; other workers keep their mapping and republish on their next load
+    if get_backend_name() == 'shared':
+        unlink_version(entry.version, tenant)
+    get_data_watcher(tenant).stop()
+    get_data_watcher.clear(tenant)
+
+@st.cache_resource
+def get_dataset_cache():
+    # Tenants' datasets share one memory budget across the process; each is
+    # loaded on its first request and the least recently used are evicted
+    return DatasetCache(
+        load=load_shared_backend if get_backend_name() == 'shared' else load_backend, on_evict=release_tenant
+    )
+
+@tracked_cache('sqlite_backend', cache=st.cache_resource, max_entries=2)
+def get_sqlite_backend(tenant, data_version):
+    paths = tenant_paths(tenant)
+    if sqlite_database_is_stale(paths.root, paths.sqlite_path):
+        build_sqlite_database(paths.root, paths.sqlite_path)
+    return SQLiteBackend(paths.sqlite_path)
+
+@tracked_cache('shared_backend', cache=st.cache_resource, max_entries=1)
+def get_shared_backend(data_version, _manifest):
+    # The first worker on the host publishes the dataset into shared memory;
+    # every other worker attaches zero-copy. cache_resource hands out the
+    # same frames to every session instead of a pickled copy per call.
+    frames, segment = attach_or_publish(_manifest)
+    backend = PandasBackend(frames['business'], frames['marketing'], frames['campaigns'])
+    backend.segment = segment
+    return backend
+
+@tracked_cache('response_curves', max_entries=TENANT_CACHE_ENTRIES)
+def get_response_curves(tenant, data_version, start_date, end_date, platforms, states, by_state, _backend):
+    # Fits only change with the data or the filters; budget changes re-solve
+    # the allocation against these cached curves
+    return fit_from_backend(_backend, start_date, end_date, platforms, states, by_state)
+
+@tracked_cache('stored_insights', ttl=60, max_entries=TENANT_CACHE_ENTRIES)
+def get_stored_insights(tenant, data_version, _manifest):
+    # Written by the pre-warm job after each pipeline run; the ttl picks up a
+    # job that finishes after the dashboard first loaded this version
+    stored = load_insights(_manifest, tenant_paths(tenant).root)
+    return stored['insights'] if stored else {}
+
+def get_tenant():
+    # ?tenant=<id> selects a brand's dataset; without it the deployment's
+    # default tenant (or the single-brand data) is served
+    return validate_tenant(st.query_params.get(TENANT_QUERY_PARAM) or get_default_tenant())
+
+def load_data(tenant=None):
+    # Returns the backend with the manifest it was built from; everything
+    # cached per data version is keyed by that manifest, not by re-reading
+    # the watcher, which may have swapped versions since
     try:
-        business_data = pd.read_csv('processed_business_data.csv')
-        marketing_data = pd.read_csv('processed_marketing_data.csv')
+        watcher = get_data_watcher(tenant)
+        manifest = watcher.current()
+        
+        if get_backend_name() == 'sqlite':
+            return get_sqlite_backend(tenant, manifest['version']), manifest
+        if tenant is not None:
+            return get_dataset_cache().backend(tenant, manifest), manifest
+        if get_backend_name() == 'shared':
+            return get_shared_backend(manifest['version'], manifest), manifest
         
-        business_data['date'] = pd.to_datetime(business_data['date'])
-        marketing_data['date'] = pd.to_datetime(marketing_data['date'])
+        def load_partition(root, partition):
+            df, hit = watcher.load_partition(root, partition)
+            record_cache_access('load_partition', hit)
+            return df
         
-        return business_data, marketing_data
+        # Only the manifest is read here; partitions overlapping each query's
+        # date range are loaded (and cached per content hash) on demand
+        return PartitionedBackend(manifest, read=load_partition, encoded=watcher.encoded), manifest
     except FileNotFoundError:
-        st.error("Processed data files not found. Please run data_processor.py first.")
+        command = "data_processor.py" if tenant is None else f"data_processor.py --tenant {tenant}"
+        st.error(f"Processed data files not found. Please run {command} first.")
+        return None, None
+    except IncompatibleSnapshot as e:
+        st.error(str(e))
         return None, None
 
-def create_kpi_cards(data, selected_date_range):
+def kpi_cards(kpis):
+    # (label, value, delta) per card, shared with the headless report renderer
+    return [
+        ("Total Revenue", f"${kpis['total_revenue']:,.0f}", f"{kpis['total_revenue_per_day']:.0f}/day"),
+        ("Total Orders", f"{kpis['num_of_orders']:,.0f}", f"{kpis['num_of_orders_per_day']:.0f}/day"),
+        ("ROAS", f"{kpis['total_roas']:.2f}x", f"${kpis['spend']:,.0f} spend"),
+        ("New Customers", f"{kpis['new_customers']:,.0f}", f"{kpis['new_customers_per_day']:.0f}/day"),
+        ("AOV", f"${kpis['avg_order_value']:.0f}", f"{kpis['gross_margin']:.1f}% margin"),
+    ]
+
+def create_kpi_cards(backend, selected_date_range):
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_data = data[
-        (data['date'] >= start_date) & 
-        (data['date'] <= end_date)
-    ]
-    
-    col1, col2, col3, col4, col5 = st.columns(5)
-    
-    with col1:
-        total_revenue = filtered_data['total_revenue'].sum()
-        st.metric(
-            label="Total Revenue",
-            value=f"${total_revenue:,.0f}",
-            delta=f"{filtered_data['total_revenue'].mean():.0f}/day"
-        )
-    
-    with col2:
-        total_orders = filtered_data['num_of_orders'].sum()
-        st.metric(
-            label="Total Orders",
-            value=f"{total_orders:,}",
-            delta=f"{filtered_data['num_of_orders'].mean():.0f}/day"
-        )
-    
-    with col3:
-        total_spend = filtered_data['spend'].sum()
-        roas = filtered_data['attributed_revenue'].sum() / total_spend if total_spend > 0 else 0
-        st.metric(
-            label="ROAS",
-            value=f"{roas:.2f}x",
-            delta=f"${total_spend:,.0f} spend"
-        )
-    
-    with col4:
-        new_customers = filtered_data['new_customers'].sum()
-        st.metric(
-            label="New Customers",
-            value=f"{new_customers:,}",
-            delta=f"{filtered_data['new_customers'].mean():.0f}/day"
-        )
+    kpis = aggregates.kpi_summary(backend, start_date, end_date)
     
-    with col5:
-        avg_order_value = filtered_data['total_revenue'].sum() / total_orders if total_orders > 0 else 0
-        st.metric(
-            label="AOV",
-            value=f"${avg_order_value:.0f}",
-            delta=f"{(filtered_data['gross_margin'].mean()):.1f}% margin"
-        )
+    for col, (label, value, delta) in zip(st.columns(5), kpi_cards(kpis)):
+        with col:
+            st.metric(label=label, value=value, delta=delta)
 
-def create_revenue_trends_chart(data, selected_date_range):
+def create_revenue_trends_chart(backend, selected_date_range):
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_data = data[
-        (data['date'] >= start_date) & 
-        (data['date'] <= end_date)
-    ].sort_values('date')
+    filtered_data = backend.business(
+        start_date, end_date,
+        columns=['total_revenue', 'num_of_orders', 'spend', 'attributed_revenue',
+                 'total_revenue_ma7', 'total_revenue_anomaly', 'total_roas_ma7']
+    )
+    filtered_data = add_kpis(filtered_data, ['total_roas'])
+    # Rolling means and anomaly flags are precomputed by the pipeline over the
+    # full history, so the first days of a filtered range are smoothed too
+    anomalies = filtered_data[filtered_data['total_revenue_anomaly'].astype(bool)]
     
     fig = make_subplots(
         rows=2, cols=2,
@@ -142,6 +212,16 @@ def create_revenue_trends_chart(data, selected_date_range):
                   name='Total Revenue', line=dict(color='#1f77b4', width=3)),
         row=1, col=1, secondary_y=False
     )
+    fig.add_trace(
+        go.Scatter(x=filtered_data['date'], y=filtered_data['total_revenue_ma7'],
+                  name='Revenue (7-day avg)', line=dict(color='#1f77b4', width=2, dash='dot')),
+        row=1, col=1, secondary_y=False
+    )
+    fig.add_trace(
+        go.Scatter(x=anomalies['date'], y=anomalies['total_revenue'], mode='markers',
+                  name='Revenue Anomaly', marker=dict(color='#d62728', size=10, symbol='x')),
+        row=1, col=1, secondary_y=False
+    )
     fig.add_trace(
         go.Scatter(x=filtered_data['date'], y=filtered_data['attributed_revenue'], 
                   name='Attributed Revenue', line=dict(color='#ff7f0e', width=2)),
@@ -165,6 +245,11 @@ def create_revenue_trends_chart(data, selected_date_range):
                   name='ROAS', line=dict(color='#9467bd', width=3)),
         row=2, col=2, secondary_y=False
     )
+    fig.add_trace(
+        go.Scatter(x=filtered_data['date'], y=filtered_data['total_roas_ma7'],
+                  name='ROAS (7-day)', line=dict(color='#9467bd', width=2, dash='dot')),
+        row=2, col=2, secondary_y=False
+    )
     
     fig.update_layout(height=600, showlegend=False, title_text="")
     fig.update_xaxes(title_text="Date")
@@ -176,26 +261,11 @@ def create_revenue_trends_chart(data, selected_date_range):
     
     return fig
 
-def create_platform_analysis(marketing_data, selected_date_range, selected_platforms, selected_states):
+def create_platform_analysis(backend, selected_date_range, selected_platforms, selected_states):
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_data = marketing_data[
-        (marketing_data['date'] >= start_date) & 
-        (marketing_data['date'] <= end_date) &
-        (marketing_data['platform'].isin(selected_platforms)) &
-        (marketing_data['state'].isin(selected_states))
-    ]
-    
-    platform_summary = filtered_data.groupby('platform').agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'clicks': 'sum',
-        'impression': 'sum',
-        'roas': 'mean',
-        'ctr': 'mean',
-        'cpc': 'mean'
-    }).reset_index()
+    summary = aggregates.platform_summary(backend, start_date, end_date, selected_platforms, selected_states)
     
     fig = make_subplots(
         rows=2, cols=2,
@@ -206,25 +276,25 @@ def create_platform_analysis(marketing_data, selected_date_range, selected_platf
     )
     
     fig.add_trace(
-        go.Pie(labels=platform_summary['platform'], values=platform_summary['spend'],
+        go.Pie(labels=summary['platform'], values=summary['spend'],
                name="Spend Distribution", hole=0.3),
         row=1, col=1
     )
     
     fig.add_trace(
-        go.Bar(x=platform_summary['platform'], y=platform_summary['roas'],
+        go.Bar(x=summary['platform'], y=summary['roas'],
                name='ROAS', marker_color='#1f77b4'),
         row=1, col=2
     )
     
     fig.add_trace(
-        go.Bar(x=platform_summary['platform'], y=platform_summary['ctr'],
+        go.Bar(x=summary['platform'], y=summary['ctr'],
                name='CTR', marker_color='#ff7f0e'),
         row=2, col=1
     )
     
     fig.add_trace(
-        go.Bar(x=platform_summary['platform'], y=platform_summary['cpc'],
+        go.Bar(x=summary['platform'], y=summary['cpc'],
                name='CPC', marker_color='#2ca02c'),
         row=2, col=2
     )
@@ -234,29 +304,16 @@ def create_platform_analysis(marketing_data, selected_date_range, selected_platf
     fig.update_yaxes(title_text="CTR (%)", row=2, col=1)
     fig.update_yaxes(title_text="CPC ($)", row=2, col=2)
     
-    return fig, platform_summary
+    return fig, summary
 
-def create_tactic_analysis(marketing_data, selected_date_range, selected_platforms, selected_states):
+def create_tactic_analysis(backend, selected_date_range, selected_platforms, selected_states):
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_data = marketing_data[
-        (marketing_data['date'] >= start_date) & 
-        (marketing_data['date'] <= end_date) &
-        (marketing_data['platform'].isin(selected_platforms)) &
-        (marketing_data['state'].isin(selected_states))
-    ]
-    
-    tactic_summary = filtered_data.groupby(['platform', 'tactic']).agg({
-        'spend': 'sum',
-        'attributed_revenue': 'sum',
-        'roas': 'mean',
-        'ctr': 'mean',
-        'cpc': 'mean'
-    }).reset_index()
+    summary = aggregates.tactic_summary(backend, start_date, end_date, selected_platforms, selected_states)
     
     fig = px.bar(
-        tactic_summary, 
+        summary, 
         x='platform', 
         y='roas', 
         color='tactic',
@@ -266,28 +323,69 @@ def create_tactic_analysis(marketing_data, selected_date_range, selected_platfor
     
     fig.update_layout(height=400)
     
-    return fig, tactic_summary
+    return fig, summary
 
-def create_weekly_analysis(data, selected_date_range):
+def create_budget_optimization(curves, budget_pct, warm_start=None):
+    budget = curves['spend'].sum() * budget_pct / 100
+    allocation, multiplier = allocate_budget(curves, budget, warm_start=warm_start)
+    summary = summarize_allocation(allocation)
+    
+    cells = [col for col in ('platform', 'tactic', 'state') if col in allocation.columns]
+    labels = allocation[cells].astype(str).agg(' - '.join, axis=1)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=labels, y=allocation['current_spend'], name='Current', marker_color='#7f7f7f'))
+    fig.add_trace(go.Bar(x=labels, y=allocation['optimal_spend'], name='Optimized', marker_color='#2ca02c'))
+    fig.update_layout(
+        height=400, barmode='group', title='Daily Spend: Current vs Optimized',
+        yaxis_title='Daily Spend ($)'
+    )
+    
+    return fig, allocation, summary, multiplier
+
+CAMPAIGN_METRICS = {
+    'ROAS': 'roas',
+    'Attributed Revenue': 'attributed_revenue',
+    'Spend': 'spend',
+    'CTR': 'ctr',
+    'CPC': 'cpc'
+}
+LOWER_IS_BETTER = {'cpc'}
+
+def create_campaign_drilldown(backend, selected_date_range, selected_platforms, selected_states, metric, k, min_spend):
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_data = data[
-        (data['date'] >= start_date) & 
-        (data['date'] <= end_date)
-    ].copy()
+    best_largest = metric not in LOWER_IS_BETTER
+    best, campaign_count = aggregates.campaign_ranking(
+        backend, start_date, end_date, selected_platforms, selected_states,
+        metric=metric, k=k, largest=best_largest, min_spend=min_spend
+    )
+    worst, _ = aggregates.campaign_ranking(
+        backend, start_date, end_date, selected_platforms, selected_states,
+        metric=metric, k=k, largest=not best_largest, min_spend=min_spend
+    )
+    
+    metric_label = {value: label for label, value in CAMPAIGN_METRICS.items()}[metric]
+    # Only the k selected rows are charted, best at the top
+    chart_data = best.iloc[::-1].astype({'campaign': str})
+    fig = px.bar(
+        chart_data,
+        x=metric,
+        y='campaign',
+        orientation='h',
+        title=f'Top {len(best)} Campaigns by {metric_label}',
+        color_discrete_sequence=['#1f77b4']
+    )
+    fig.update_layout(height=max(300, 22 * len(best)), yaxis_title=None)
     
-    weekly_data = filtered_data.groupby('day_of_week').agg({
-        'total_revenue': 'mean',
-        'num_of_orders': 'mean',
-        'spend': 'mean',
-        'attributed_revenue': 'mean',
-        'total_roas': 'mean'
-    }).reset_index()
+    return fig, best, worst, campaign_count
+
+def create_weekly_analysis(backend, selected_date_range):
+    start_date = pd.to_datetime(selected_date_range[0])
+    end_date = pd.to_datetime(selected_date_range[1])
     
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    weekly_data['day_of_week'] = pd.Categorical(weekly_data['day_of_week'], categories=day_order, ordered=True)
-    weekly_data = weekly_data.sort_values('day_of_week')
+    weekly_data = aggregates.weekly_summary(backend, start_date, end_date)
     
     fig = make_subplots(
         rows=1, cols=2,
@@ -313,11 +411,33 @@ def create_weekly_analysis(data, selected_date_range):
     
     return fig, weekly_data
 
+def render_insight(text):
+    # Blank lines around the text let Streamlit render it as markdown inside the HTML box
+    st.markdown(f'<div class="insight-box">\n\n{text}\n\n</div>', unsafe_allow_html=True)
+
+def show_insight(entry, generate, button_key, ai_available, profiler, label):
+    # Pre-generated AI results are served as-is; otherwise the stored or local
+    # analysis is shown with the option to have Gemini rewrite it
+    enhance = ai_available and (entry is None or entry['source'] != 'gemini') and st.button(
+        "Enhance with AI", key=button_key
+    )
+    if entry is not None and not enhance:
+        render_insight(entry['text'])
+        st.caption("Pre-generated " + ("AI analysis" if entry['source'] == 'gemini' else "local analysis"))
+        return
+    
+    with st.spinner(f"Generating {label}..."), profiler.section(label):
+        text = generate(enhance)
+    render_insight(text)
+
 def main():
+    profiler = DashboardProfiler.from_request()
+    
     st.markdown('<h1 class="main-header">🧙‍♂️ Marketing Intelligence Dashboard</h1>', unsafe_allow_html=True)
     
-    ai_generator = AIInsightsGenerator()
-    ai_available = ai_generator.initialize()
+    with profiler.section("AI initialize"):
+        ai_generator = AIInsightsGenerator()
+        ai_available = ai_generator.initialize()
     
     if ai_available:
         st.success("Advanced AI Analytics Available Powered by Google Gemini")
@@ -352,15 +472,23 @@ def main():
             st.write("2. For Streamlit Cloud: Add GEMINI_API_KEY to your app's secrets")
             st.write("3. Redeploy your application")
     
-    business_data, marketing_data = load_data()
+    try:
+        tenant = get_tenant()
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
     
-    if business_data is None or marketing_data is None:
+    with profiler.section("load_data"):
+        backend, manifest = load_data(tenant)
+    
+    if backend is None:
         st.stop()
     
     st.sidebar.header("Dashboard Controls")
+    data_version = manifest['version']
+    st.sidebar.caption(f"Data version: {data_version}" if tenant is None else f"Tenant: {tenant} | Data version: {data_version}")
     
-    min_date = business_data['date'].min().date()
-    max_date = business_data['date'].max().date()
+    min_date, max_date = (bound.date() for bound in backend.date_bounds())
     
     selected_date_range = st.sidebar.date_input(
         "Select Date Range",
@@ -372,14 +500,14 @@ def main():
     if len(selected_date_range) != 2:
         selected_date_range = (min_date, max_date)
     
-    available_platforms = marketing_data['platform'].unique().tolist()
+    available_platforms = backend.dimension_values('platform')
     selected_platforms = st.sidebar.multiselect(
         "Select Platforms",
         options=available_platforms,
         default=available_platforms
     )
     
-    available_states = marketing_data['state'].unique().tolist()
+    available_states = backend.dimension_values('state')
     selected_states = st.sidebar.multiselect(
         "Select States",
         options=available_states,
@@ -391,90 +519,169 @@ def main():
     start_date = pd.to_datetime(selected_date_range[0])
     end_date = pd.to_datetime(selected_date_range[1])
     
-    filtered_business = business_data[
-        (business_data['date'] >= start_date) & 
-        (business_data['date'] <= end_date)
-    ]
-    
-    total_revenue = filtered_business['total_revenue'].sum()
-    total_spend = filtered_business['spend'].sum()
-    total_roas = filtered_business['attributed_revenue'].sum() / total_spend if total_spend > 0 else 0
+    with profiler.section("sidebar filtering"):
+        sidebar_totals = backend.business_summary(
+            None, start_date, end_date, kpis=['total_roas'], components=['total_revenue']
+        ).iloc[0]
     
-    st.sidebar.metric("Total Revenue", f"${total_revenue:,.0f}")
-    st.sidebar.metric("Total Marketing Spend", f"${total_spend:,.0f}")
-    st.sidebar.metric("Overall ROAS", f"{total_roas:.2f}x")
+    st.sidebar.metric("Total Revenue", f"${sidebar_totals['total_revenue']:,.0f}")
+    st.sidebar.metric("Total Marketing Spend", f"${sidebar_totals['spend']:,.0f}")
+    st.sidebar.metric("Overall ROAS", f"{sidebar_totals['total_roas']:.2f}x")
     
     
     st.header("Executive Summary")
-    create_kpi_cards(business_data, selected_date_range)
+    with profiler.section("create_kpi_cards"):
+        create_kpi_cards(backend, selected_date_range)
     
     st.header("📈 Advanced Analytics")
     
+    if ai_available:
+        ai_status = gemini_client.status()
+        latency = (
+            f" | p50 {ai_status['p50_seconds']:.1f}s, p95 {ai_status['p95_seconds']:.1f}s, max {ai_status['max_seconds']:.1f}s"
+            if 'p95_seconds' in ai_status else ""
+        )
+        st.caption(
+            f"Gemini circuit: {ai_status['circuit']} | {ai_status['calls']} calls, {ai_status['failures']} failed, "
+            f"{ai_status['timeouts']} timed out, {ai_status['short_circuited']} served locally{latency}"
+        )
+    
     tab1, tab2, tab3 = st.tabs(["Performance Summary", "Trend Analysis", "Platform Recommendations"])
     
+    # Tabs open with the stored or local rule-based analysis, both instant;
+    # Gemini only rewrites it as prose on request
+    stored_insights = get_stored_insights(tenant, data_version, manifest)
+    all_states = set(selected_states) == set(available_states)
+    
     with tab1:
         st.subheader("Performance Analysis")
-        if st.button("Generate Summary"):
-            with st.spinner("Analyzing performance..."):
-                ai_summary = ai_generator.generate_performance_summary(
-                    business_data, marketing_data, selected_date_range
-                )
-                st.markdown(f'<div class="insight-box">{ai_summary}</div>', unsafe_allow_html=True)
+        show_insight(
+            stored_insights.get(insight_key('performance', start_date, end_date)),
+            lambda use_llm: ai_generator.generate_performance_summary(backend, selected_date_range, use_llm=use_llm),
+            "enhance_summary", ai_available, profiler, "performance insights"
+        )
     
     with tab2:
         st.subheader("Trend Analysis")
-        if st.button("Analyze Trends"):
-            with st.spinner("Analyzing trends..."):
-                trend_analysis = ai_generator.generate_trend_analysis(
-                    business_data, selected_date_range
-                )
-                st.markdown(f'<div class="insight-box">{trend_analysis}</div>', unsafe_allow_html=True)
+        show_insight(
+            stored_insights.get(insight_key('trends', start_date, end_date)),
+            lambda use_llm: ai_generator.generate_trend_analysis(backend, selected_date_range, use_llm=use_llm),
+            "enhance_trends", ai_available, profiler, "trend insights"
+        )
+    
+    def generate_recommendations(use_llm):
+        curves = get_response_curves(
+            tenant, data_version, start_date, end_date, selected_platforms, selected_states, False, backend
+        )
+        return ai_generator.generate_platform_recommendations(
+            backend, selected_date_range, selected_platforms, allocate_budget(curves)[0],
+            selected_states, use_llm=use_llm
+        )
     
     with tab3:
         st.subheader("Platform Recommendations")
-        if st.button("Get Recommendations"):
-            with st.spinner("Generating recommendations..."):
-                recommendations = ai_generator.generate_platform_recommendations(
-                    marketing_data, selected_date_range, selected_platforms
-                )
-                st.markdown(f'<div class="insight-box">{recommendations}</div>', unsafe_allow_html=True)
+        # Stored recommendations cover every state, so a state filter
+        # always gets a fresh analysis
+        show_insight(
+            stored_insights.get(insight_key('platforms', start_date, end_date, selected_platforms)) if all_states else None,
+            generate_recommendations, "enhance_recommendations", ai_available, profiler, "platform insights"
+        )
     
     st.header("Performance Trends")
-    trends_chart = create_revenue_trends_chart(business_data, selected_date_range)
-    st.plotly_chart(trends_chart, use_container_width=True)
+    with profiler.section("create_revenue_trends_chart"):
+        trends_chart = create_revenue_trends_chart(backend, selected_date_range)
+    profiler.plotly_chart("trends_chart", trends_chart, use_container_width=True)
     
     st.header("Platform Performance")
-    platform_chart, platform_summary = create_platform_analysis(
-        marketing_data, selected_date_range, selected_platforms, selected_states
-    )
-    st.plotly_chart(platform_chart, use_container_width=True)
+    with profiler.section("create_platform_analysis"):
+        platform_chart, platform_summary = create_platform_analysis(
+            backend, selected_date_range, selected_platforms, selected_states
+        )
+    profiler.plotly_chart("platform_chart", platform_chart, use_container_width=True)
     
     st.subheader("Platform Summary Table")
     platform_summary_display = platform_summary.round(2)
-    st.dataframe(platform_summary_display, use_container_width=True)
+    profiler.dataframe("platform_summary", platform_summary_display, use_container_width=True)
     
     st.header("Tactic Performance")
-    tactic_chart, tactic_summary = create_tactic_analysis(
-        marketing_data, selected_date_range, selected_platforms, selected_states
-    )
-    st.plotly_chart(tactic_chart, use_container_width=True)
+    with profiler.section("create_tactic_analysis"):
+        tactic_chart, tactic_summary = create_tactic_analysis(
+            backend, selected_date_range, selected_platforms, selected_states
+        )
+    profiler.plotly_chart("tactic_chart", tactic_chart, use_container_width=True)
+    
+    st.header("Budget Optimizer")
+    col1, col2 = st.columns(2)
+    with col1:
+        budget_pct = st.slider("Daily budget (% of current)", min_value=50, max_value=150, value=100, step=5)
+    with col2:
+        by_state = st.checkbox("Optimize per state", value=False)
+    
+    with profiler.section("create_budget_optimization"):
+        curves = get_response_curves(
+            tenant, data_version, start_date, end_date, selected_platforms, selected_states, by_state, backend
+        )
+        budget_chart, budget_allocation, budget_summary, multiplier = create_budget_optimization(
+            curves, budget_pct, st.session_state.get('budget_multiplier')
+        )
+        st.session_state['budget_multiplier'] = multiplier
+    
+    col1, col2, col3 = st.columns(3)
+    current_revenue = budget_summary['current_revenue'].sum()
+    optimal_revenue = budget_summary['optimal_revenue'].sum()
+    with col1:
+        st.metric("Optimized Daily Spend", f"${budget_summary['optimal_spend'].sum():,.0f}")
+    with col2:
+        st.metric(
+            "Predicted Daily Attributed Revenue", f"${optimal_revenue:,.0f}",
+            delta=f"{(optimal_revenue / current_revenue - 1) * 100:+.1f}%" if current_revenue else None
+        )
+    with col3:
+        st.metric("Response Curves Fitted", f"{int(curves['fitted'].sum())} of {len(curves)}")
+    
+    profiler.plotly_chart("budget_chart", budget_chart, use_container_width=True)
+    profiler.dataframe("budget_summary", budget_summary.round(2), use_container_width=True, hide_index=True)
+    with st.expander("Allocation by cell"):
+        profiler.dataframe("budget_allocation", budget_allocation.round(2), use_container_width=True, hide_index=True)
+    
+    st.header("Campaign Drilldown")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        metric_label = st.selectbox("Rank campaigns by", list(CAMPAIGN_METRICS))
+    with col2:
+        top_k = st.number_input("Campaigns to show", min_value=5, max_value=100, value=20, step=5)
+    with col3:
+        min_spend = st.number_input("Minimum spend ($)", min_value=0.0, value=0.0, step=100.0)
+    
+    with profiler.section("create_campaign_drilldown"):
+        campaign_chart, best_campaigns, worst_campaigns, campaign_count = create_campaign_drilldown(
+            backend, selected_date_range, selected_platforms, selected_states,
+            CAMPAIGN_METRICS[metric_label], int(top_k), min_spend
+        )
+    st.caption(f"Top and bottom {len(best_campaigns)} of {campaign_count:,} campaigns with at least ${min_spend:,.0f} spend")
+    profiler.plotly_chart("campaign_chart", campaign_chart, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Best Campaigns")
+        profiler.dataframe("best_campaigns", best_campaigns.round(2), use_container_width=True, hide_index=True)
+    with col2:
+        st.subheader("Worst Campaigns")
+        profiler.dataframe("worst_campaigns", worst_campaigns.round(2), use_container_width=True, hide_index=True)
     
     st.header("Weekly Performance Patterns")
-    weekly_chart, weekly_data = create_weekly_analysis(business_data, selected_date_range)
-    st.plotly_chart(weekly_chart, use_container_width=True)
+    with profiler.section("create_weekly_analysis"):
+        weekly_chart, weekly_data = create_weekly_analysis(backend, selected_date_range)
+    profiler.plotly_chart("weekly_chart", weekly_chart, use_container_width=True)
     
     st.header("Key Insights")
     
-    filtered_marketing = marketing_data[
-        (marketing_data['date'] >= start_date) & 
-        (marketing_data['date'] <= end_date) &
-        (marketing_data['platform'].isin(selected_platforms)) &
-        (marketing_data['state'].isin(selected_states))
-    ]
-    
-    best_platform = filtered_marketing.groupby('platform')['roas'].mean().idxmax()
-    best_tactic = filtered_marketing.groupby('tactic')['roas'].mean().idxmax()
-    best_day = weekly_data.loc[weekly_data['total_revenue'].idxmax(), 'day_of_week']
+    with profiler.section("key insights"):
+        best_platform = platform_summary.set_index('platform')['roas'].idxmax()
+        best_tactic = backend.marketing_summary(
+            'tactic', start_date, end_date, selected_platforms, selected_states, kpis=['roas']
+        ).set_index('tactic')['roas'].idxmax()
+        best_day = weekly_data.loc[weekly_data['total_revenue'].idxmax(), 'day_of_week']
     
     col1, col2, col3 = st.columns(3)
     
@@ -496,6 +703,8 @@ def main():
         """, 
         unsafe_allow_html=True
     )
+    
+    profiler.render()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from data_storage import PROCESSED_ROOT, read_dataset
+from data_watcher import DataWatcher
+from query_backend import PandasBackend
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+RESPONSE_CACHE_SIZE = 1024
+
+# Endpoint -> (aggregate, accepts platform/state filters)
+ENDPOINTS = {
+    '/kpis': (aggregates.kpi_summary, False),
+    '/platforms': (aggregates.platform_summary, True),
+    '/tactics': (aggregates.tactic_summary, True),
+    '/day-of-week': (aggregates.weekly_summary, False),
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def _records(df):
+    return df.to_dict('records')
+
+
+def _finite(value):
+    # NaN and infinity are not valid JSON (means over an empty range are
+    # NaN), so they are sent as null
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+        return None
+    return value
+
+
+class MetricsService:
+    def __init__(self, root=PROCESSED_ROOT, cache_size=RESPONSE_CACHE_SIZE, watcher=None):
+        self.watcher = watcher or DataWatcher(root)
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._backend = None
+        self._bounds = None
+        self._version = None
+        self._responses = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def backend(self):
+        manifest = self.watcher.current()
+        with self._lock:
+            if manifest['version'] != self._version:
+                # The API serves every window, so the whole current version is
+                # held in memory and reloaded only when the version changes
+                self._backend = PandasBackend(*(read_dataset(manifest, name) for name in ('business', 'marketing', 'campaigns')))
+                self._bounds = pd.to_datetime(manifest['min_date']), pd.to_datetime(manifest['max_date'])
+                self._version = manifest['version']
+                self._responses.clear()
+            return self._backend, self._version
+
+    def parse_filters(self, endpoint, query):
+        with_dimensions = ENDPOINTS[endpoint][1]
+        self.backend()
+        min_date, max_date = self._bounds
+
+        try:
+            start = pd.to_datetime(query.get('start', [min_date])[0])
+            end = pd.to_datetime(query.get('end', [max_date])[0])
+        except (ValueError, TypeError) as e:
+            raise BadRequest(f"Invalid date: {e}")
+        if pd.isna(start) or pd.isna(end):
+            raise BadRequest("Invalid date: start and end must be dates")
+        if start > end:
+            raise BadRequest("start must not be after end")
+
+        filters = {'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}
+        if with_dimensions:
+            for name in ('platforms', 'states'):
+                values = query.get(name)
+                filters[name] = sorted(v for v in ','.join(values).split(',') if v) if values else None
+        return filters
+
+    def _compute(self, backend, endpoint, filters):
+        aggregate, with_dimensions = ENDPOINTS[endpoint]
+
+        if with_dimensions:
+            result = aggregate(backend, filters['start'], filters['end'], filters['platforms'], filters['states'])
+        else:
+            result = aggregate(backend, filters['start'], filters['end'])
+        return _records(result) if isinstance(result, pd.DataFrame) else result
+
+    def etag(self, endpoint, filters):
+        # Derived from the data version and the normalized filter only, so
+        # conditional requests are answered without computing anything
+        _, version = self.backend()
+        key = json.dumps([version, endpoint, filters], sort_keys=True)
+        return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+
+    def respond(self, endpoint, filters, etag):
+        with self._lock:
+            body = self._responses.get(etag)
+            if body is not None:
+                self._responses.move_to_end(etag)
+                self.hits += 1
+                return etag, body
+
+        backend, version = self.backend()
+        payload = {
+            'version': version,
+            'filters': filters,
+            'data': _finite(self._compute(backend, endpoint, filters))
+        }
+        body = json.dumps(payload, default=_json_default, allow_nan=False).encode('utf-8')
+
+        with self._lock:
+            self.misses += 1
+            self._responses[etag] = body
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return etag, body
+
+
+def make_handler(service):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle enabled every
+        # keep-alive response would wait on the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body=b'', etag=None, content_type='application/json'):
+            self.send_response(status)
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            if status != 304:
+                self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+        def do_GET(self):
+            # Any unexpected failure still gets a JSON response instead of a
+            # dropped connection
+            try:
+                self._handle()
+            except Exception as e:
+                self._error(500, f"Internal error: {type(e).__name__}: {e}")
+
+        def _handle(self):
+            url = urlsplit(self.path)
+
+            if url.path == '/health':
+                _, version = service.backend()
+                stats = {'status': 'ok', 'version': version, 'cache_hits': service.hits, 'cache_misses': service.misses}
+                self._send(200, json.dumps(stats).encode('utf-8'))
+                return
+
+            if url.path not in ENDPOINTS:
+                self._error(404, f"Unknown endpoint. Available: {', '.join(['/health'] + list(ENDPOINTS))}")
+                return
+
+            query = parse_qs(url.query)
+            try:
+                filters = service.parse_filters(url.path, query)
+                etag = service.etag(url.path, filters)
+
+                if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                    self._send(304, etag=etag)
+                    return
+
+                etag, body = service.respond(url.path, filters, etag)
+            except BadRequest as e:
+                self._error(400, str(e))
+                return
+
+            self._send(200, body, etag=etag)
+
+        def log_message(self, format, *args):
+            # Per-request logging to stderr costs more than serving a cached response
+            pass
+
+    return MetricsHandler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, root=PROCESSED_ROOT):
+    service = MetricsService(root)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Serving marketing metrics on http://{host}:{port} (data version {service.backend()[1]})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON API for dashboard KPI, platform, tactic and day-of-week aggregates")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--root', default=PROCESSED_ROOT)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.root)
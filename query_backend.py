@@ -0,0 +1,384 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import group_kernels
+from data_storage import PROCESSED_ROOT, overlapping_partitions, read_dataset, read_manifest, read_partition
+from kpis import MARKETING_COMPONENTS, add_kpis, kpi_components
+
+SQLITE_PATH = 'processed_data.db'
+BACKEND_ENV_VAR = 'DASHBOARD_BACKEND'
+TABLES = ('business', 'marketing', 'campaigns')
+ENCODED_CACHE_ENV_VAR = 'ENCODED_CACHE_MB'
+DEFAULT_ENCODED_CACHE_MB = 64
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def get_encoded_cache_budget():
+    return int(float(os.getenv(ENCODED_CACHE_ENV_VAR, DEFAULT_ENCODED_CACHE_MB)) * 1024 * 1024)
+
+
+def _nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class EncodedCache:
+    # Frames and group codes built by the pandas backends. Every date range
+    # over new partitions adds a frame, so the least recently used entries
+    # are dropped once the cache exceeds its byte budget.
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes or get_encoded_cache_budget()
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        value = compute()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (value, _nbytes(value))
+            self.nbytes += self._entries[key][1]
+            # The entry just added always stays, even if it alone exceeds the budget
+            while len(self._entries) > 1 and self.nbytes > self.budget_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def retain(self, keep):
+        with self._lock:
+            for key in [key for key in self._entries if not keep(key)]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+
+def _summary_columns(kpis, components):
+    columns = list(components)
+    for col in kpi_components(kpis):
+        if col not in columns:
+            columns.append(col)
+    return columns
+
+
+class QueryBackend:
+    name = None
+
+    def date_bounds(self):
+        raise NotImplementedError
+
+    def dimension_values(self, column):
+        raise NotImplementedError
+
+    def business(self, start, end, columns=None):
+        raise NotImplementedError
+
+    def marketing(self, start, end, platforms=None, states=None, columns=None):
+        raise NotImplementedError
+
+    def _grouped(self, table, by, start, end, platforms, states, columns, agg):
+        raise NotImplementedError
+
+    def marketing_summary(self, by, start, end, platforms=None, states=None, kpis=(), components=None):
+        by = _as_list(by)
+        columns = _summary_columns(kpis, components or MARKETING_COMPONENTS)
+        summary = self._grouped('marketing', by, start, end, platforms, states, columns, 'sum')
+        return add_kpis(summary, kpis) if kpis else summary
+
+    def campaign_summary(self, start, end, platforms=None, states=None, kpis=(), components=None):
+        # One row of totals per campaign; ranking happens on these, never on raw rows
+        columns = _summary_columns(kpis, components or MARKETING_COMPONENTS)
+        summary = self._grouped('campaigns', ['campaign'], start, end, platforms, states, columns, 'sum')
+        return add_kpis(summary, kpis) if kpis else summary
+
+    def business_summary(self, by, start, end, kpis=(), components=(), agg='sum'):
+        by = _as_list(by)
+        columns = _summary_columns(kpis, components)
+        summary = self._grouped('business', by, start, end, None, None, columns, agg)
+        return add_kpis(summary, kpis) if kpis else summary
+
+
+class PandasBackend(QueryBackend):
+    name = 'pandas'
+
+    def __init__(self, business_data, marketing_data, campaign_data=None):
+        self.business_data = business_data
+        self.marketing_data = marketing_data
+        self.campaign_data = campaign_data
+        # Frames never change for the backend's lifetime, so group codes are
+        # computed once per column and combination and reused by every query
+        self._encoded = EncodedCache()
+
+    def date_bounds(self):
+        return self.business_data['date'].min(), self.business_data['date'].max()
+
+    def dimension_values(self, column):
+        return self.marketing_data[column].unique().tolist()
+
+    def _frame_key(self, table, start, end):
+        return table
+
+    def _frame(self, table, start, end):
+        return {
+            'business': self.business_data,
+            'marketing': self.marketing_data,
+            'campaigns': self.campaign_data
+        }[table]
+
+    def _filter(self, df, start, end, platforms=None, states=None):
+        mask = (df['date'] >= pd.to_datetime(start)) & (df['date'] <= pd.to_datetime(end))
+        if platforms is not None:
+            mask &= df['platform'].isin(platforms)
+        if states is not None:
+            mask &= df['state'].isin(states)
+        return df[mask]
+
+    def business(self, start, end, columns=None):
+        filtered = self._filter(self._frame('business', start, end), start, end)
+        if columns:
+            filtered = filtered[['date'] + [col for col in columns if col != 'date']]
+        return filtered.sort_values('date')
+
+    def marketing(self, start, end, platforms=None, states=None, columns=None):
+        filtered = self._filter(self._frame('marketing', start, end), start, end, platforms, states)
+        if columns:
+            filtered = filtered[['date'] + [col for col in columns if col != 'date']]
+        return filtered
+
+    def _cached(self, key, compute):
+        return self._encoded.get(key, compute)
+
+    def _codes(self, key, df, column):
+        return self._cached((key, column), lambda: group_kernels.encode(df[column]))
+
+    def _group_index(self, key, df, by):
+        return self._cached(
+            (key, tuple(by)), lambda: group_kernels.group_index([self._codes(key, df, col) for col in by])
+        )
+
+    def _rows(self, key, df, start, end, platforms, states):
+        dates = df['date'].to_numpy()
+        if self._cached((key, 'date_sorted'), lambda: bool(df['date'].is_monotonic_increasing)):
+            span = group_kernels.date_span(dates, start, end)
+            mask = None
+        else:
+            span = slice(None)
+            mask = (dates >= pd.Timestamp(start).to_datetime64()) & (dates <= pd.Timestamp(end).to_datetime64())
+
+        for column, selected in (('platform', platforms), ('state', states)):
+            if selected is None:
+                continue
+            # Filters test membership once per distinct value, then gather by code;
+            # the trailing False covers missing values (code -1)
+            codes, uniques = self._codes(key, df, column)
+            allowed = np.append(uniques.isin(selected), False)[codes[span]]
+            mask = allowed if mask is None else mask & allowed
+        return span, mask
+
+    def _grouped(self, table, by, start, end, platforms, states, columns, agg):
+        key = self._frame_key(table, start, end)
+        df = self._frame(table, start, end)
+        span, mask = self._rows(key, df, start, end, platforms, states)
+        index = self._group_index(key, df, by) if by else None
+        return group_kernels.aggregate(df, by, columns, agg, mask, index, span)
+
+
+class PartitionedBackend(PandasBackend):
+    name = 'partitioned'
+
+    def __init__(self, manifest, read=read_partition, encoded=None):
+        self.manifest = manifest
+        self.read = read
+        # Frames and group codes are keyed by the partitions they were built
+        # from, so a cache that outlives the backend (the data watcher's)
+        # stays valid for as long as those partitions are unchanged
+        self._encoded = EncodedCache() if encoded is None else encoded
+
+    def date_bounds(self):
+        return pd.to_datetime(self.manifest['min_date']), pd.to_datetime(self.manifest['max_date'])
+
+    def dimension_values(self, column):
+        return list(self.manifest['dimensions'][column])
+
+    def _frame_key(self, table, start, end):
+        partitions = overlapping_partitions(self.manifest, table, start, end)
+        return (table,) + tuple((p['path'], p['hash']) for p in partitions)
+
+    def _frame(self, table, start, end):
+        # Only partitions overlapping [start, end] are read. They are kept
+        # whole, so every range over the same partitions shares one frame and
+        # its codes; rows outside the range are filtered by each query.
+        return self._cached(
+            (self._frame_key(table, start, end), 'frame'),
+            lambda: read_dataset(self.manifest, table, start, end, read=self.read, trim=False)
+        )
+
+
+class SQLiteBackend(QueryBackend):
+    name = 'sqlite'
+
+    def __init__(self, db_path=SQLITE_PATH):
+        self.db_path = db_path
+        self._columns = {
+            table: self._table_columns(table) for table in TABLES
+        }
+
+    def _connect(self):
+        # A short-lived read-only connection per query keeps Streamlit's
+        # session threads independent of each other
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+
+    def _query(self, sql, params=()):
+        with closing(self._connect()) as conn:
+            result = pd.read_sql_query(sql, conn, params=params)
+        if 'date' in result.columns:
+            result['date'] = pd.to_datetime(result['date'])
+        return result
+
+    def _table_columns(self, table):
+        with closing(self._connect()) as conn:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+    def _identifiers(self, table, columns):
+        unknown = [col for col in columns if col not in self._columns[table]]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {unknown}")
+        return ', '.join(f'"{col}"' for col in columns)
+
+    def _where(self, start, end, platforms=None, states=None):
+        clauses = ['"date" BETWEEN ? AND ?']
+        params = [pd.to_datetime(start).strftime('%Y-%m-%d'), pd.to_datetime(end).strftime('%Y-%m-%d')]
+
+        for column, values in (('platform', platforms), ('state', states)):
+            if values is not None:
+                values = list(values)
+                if not values:
+                    clauses.append('0')
+                    continue
+                clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+                params.extend(values)
+
+        return ' AND '.join(clauses), params
+
+    def date_bounds(self):
+        bounds = self._query('SELECT MIN("date") AS min_date, MAX("date") AS max_date FROM business')
+        return pd.to_datetime(bounds['min_date'].iloc[0]), pd.to_datetime(bounds['max_date'].iloc[0])
+
+    def dimension_values(self, column):
+        sql = f'SELECT DISTINCT {self._identifiers("marketing", [column])} FROM marketing'
+        return self._query(sql)[column].tolist()
+
+    def business(self, start, end, columns=None):
+        columns = ['date'] + [col for col in columns if col != 'date'] if columns else self._columns['business']
+        where, params = self._where(start, end)
+        sql = f'SELECT {self._identifiers("business", columns)} FROM business WHERE {where} ORDER BY "date"'
+        return self._query(sql, params)
+
+    def marketing(self, start, end, platforms=None, states=None, columns=None):
+        columns = ['date'] + [col for col in columns if col != 'date'] if columns else self._columns['marketing']
+        where, params = self._where(start, end, platforms, states)
+        sql = f'SELECT {self._identifiers("marketing", columns)} FROM marketing WHERE {where}'
+        return self._query(sql, params)
+
+    def _grouped(self, table, by, start, end, platforms, states, columns, agg):
+        function = {'sum': 'SUM', 'mean': 'AVG'}[agg]
+        self._identifiers(table, by + columns)
+
+        select = [f'"{col}"' for col in by] + [f'{function}("{col}") AS "{col}"' for col in columns]
+        where, params = self._where(start, end, platforms, states)
+        sql = f'SELECT {", ".join(select)} FROM {table} WHERE {where}'
+        if by:
+            group = ', '.join(f'"{col}"' for col in by)
+            sql += f' GROUP BY {group} ORDER BY {group}'
+
+        return self._query(sql, params).fillna({col: 0 for col in columns})
+
+
+def build_sqlite_database(root=PROCESSED_ROOT, db_path=SQLITE_PATH):
+    print(f"Building SQLite database {db_path}...")
+
+    manifest = read_manifest(root)
+    # A unique temp file per build, so concurrent builds never write into or
+    # replace each other's half-built database
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(db_path) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        _write_sqlite_database(tmp_path, manifest)
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print("SQLite database built successfully!")
+
+
+def _write_sqlite_database(tmp_path, manifest):
+    with closing(sqlite3.connect(tmp_path)) as conn:
+        for table, dataset in manifest['datasets'].items():
+            # Load one partition at a time so building never needs the full dataset in memory
+            for partition in dataset['partitions']:
+                chunk = pd.read_csv(os.path.join(manifest['root'], partition['path']))
+                chunk.to_sql(table, conn, if_exists='append', index=False)
+        
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (manifest['version'],))
+
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_business_date ON business("date")')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_marketing_date ON marketing("date")')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_marketing_dims ON marketing("platform", "state", "date")')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_campaigns_date ON campaigns("date")')
+        conn.execute('ANALYZE')
+        conn.commit()
+
+
+def sqlite_database_version(db_path=SQLITE_PATH):
+    if not os.path.exists(db_path):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def sqlite_database_is_stale(root=PROCESSED_ROOT, db_path=SQLITE_PATH):
+    return sqlite_database_version(db_path) != read_manifest(root)['version']
+
+
+def get_backend_name():
+    name = os.getenv(BACKEND_ENV_VAR, 'pandas').strip().lower()
+    return name if name in ('pandas', 'sqlite', 'shared') else 'pandas'
+
+
+if __name__ == "__main__":
+    build_sqlite_database()
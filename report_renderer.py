@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import plotly.offline
+
+import aggregates
+from chart_payload import compact_figure
+from data_storage import PROCESSED_ROOT, read_manifest
+from insight_prewarm import standard_windows
+from query_backend import PandasBackend
+from shared_dataset import attach_frames, attach_or_publish, segment_name, unlink_version
+
+try:
+    import kaleido
+except ImportError:
+    kaleido = None
+
+REPORTS_ROOT = 'reports'
+# Separate from the dashboard's shared segments, so a batch never attaches to
+# or unlinks a segment a live server is using. Tenant ids are the dashboard's
+# namespaces and cannot contain '.', so no tenant can share this one.
+REPORT_NAMESPACE = 'reports.batch'
+WORKERS_ENV_VAR = 'REPORT_WORKERS'
+FORMATS = ('html', 'png', 'pdf')
+IMAGE_FORMATS = ('png', 'pdf')
+PLOTLY_JS = 'plotly.min.js'
+
+CHARTS = ('trends_chart', 'platform_chart', 'tactic_chart', 'weekly_chart')
+
+# platforms/states are sorted tuples, or None for every value
+View = namedtuple('View', ['start', 'end', 'platforms', 'states'])
+
+REPORT_STYLE = """
+    body { font-family: sans-serif; margin: 2rem auto; max-width: 1200px; color: #262730; }
+    h1 { color: #1f77b4; }
+    .filters { color: #666; }
+    .kpis { display: flex; gap: 1rem; margin: 1.5rem 0; }
+    .kpi { flex: 1; background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; border-left: 5px solid #1f77b4; }
+    .kpi .label { font-size: 0.9rem; color: #666; }
+    .kpi .value { font-size: 1.8rem; font-weight: bold; }
+    .kpi .delta { font-size: 0.9rem; color: #09ab3b; }
+    table.summary { border-collapse: collapse; margin: 1rem 0; }
+    table.summary th, table.summary td { border: 1px solid #ddd; padding: 0.3rem 0.6rem; text-align: right; }
+"""
+
+# Set in each worker by _init_worker
+_backend = None
+_segment = None
+_dashboard = None
+
+
+def get_workers():
+    return max(1, int(os.getenv(WORKERS_ENV_VAR, os.cpu_count() or 1)))
+
+
+def normalize_view(start, end, platforms, states, bounds, dimensions):
+    # Dates are clipped to the data and a selection of every value is the
+    # same as no filter, so requests that would render identically share a key
+    start = max(pd.to_datetime(start).normalize(), bounds[0])
+    end = min(pd.to_datetime(end).normalize(), bounds[1])
+    selections = []
+    for selected, available in ((platforms, dimensions['platform']), (states, dimensions['state'])):
+        selected = set(available if selected is None else selected) & set(available)
+        selections.append(None if selected == set(available) else tuple(sorted(selected)))
+    return View(start, end, *selections)
+
+
+def view_id(view):
+    dates = f"{view.start:%Y%m%d}-{view.end:%Y%m%d}"
+    if view.platforms is None and view.states is None:
+        return f"{dates}-all"
+    filters = json.dumps([view.platforms, view.states]).encode('utf-8')
+    return f"{dates}-{hashlib.sha1(filters).hexdigest()[:8]}"
+
+
+def view_label(view):
+    def selection(selected, name):
+        return f"all {name}" if selected is None else ', '.join(selected) or f"no {name}"
+
+    return (f"{view.start:%Y-%m-%d} to {view.end:%Y-%m-%d} | "
+            f"{selection(view.platforms, 'platforms')} | {selection(view.states, 'states')}")
+
+
+def default_views(bounds, dimensions):
+    # Standard trailing windows and every calendar month, for all platforms
+    # and states and for each platform and state on its own
+    windows = dict(standard_windows(*bounds))
+    for month in pd.period_range(bounds[0], bounds[1], freq='M'):
+        windows[str(month)] = (month.start_time, month.end_time)
+
+    platforms = [None] + [[platform] for platform in dimensions['platform']]
+    states = [None] + [[state] for state in dimensions['state']]
+    return [
+        (name, start, end, platform, state)
+        for name, (start, end) in windows.items() for platform in platforms for state in states
+    ]
+
+
+def read_views(path):
+    with open(path) as f:
+        return [
+            (spec.get('name'), spec['start'], spec['end'], spec.get('platforms'), spec.get('states'))
+            for spec in json.load(f)
+        ]
+
+
+def _init_worker(name):
+    global _backend, _segment, _dashboard
+    # Workers attach to the batch's shared segment instead of each reading
+    # the snapshot, so the data is loaded once however many workers run
+    frames, _segment = attach_frames(name)
+    _backend = PandasBackend(frames['business'], frames['marketing'], frames['campaigns'])
+
+    # The dashboard module sets up its page on import, which only warns about
+    # the missing Streamlit runtime outside `streamlit run`
+    logging.disable(logging.WARNING)
+    try:
+        import marketing_dashboard
+    finally:
+        logging.disable(logging.NOTSET)
+    _dashboard = marketing_dashboard
+
+
+def _kpi_html(cards):
+    return ''.join(
+        f'<div class="kpi"><div class="label">{html.escape(label)}</div>'
+        f'<div class="value">{html.escape(value)}</div><div class="delta">{html.escape(delta)}</div></div>'
+        for label, value, delta in cards
+    )
+
+
+def _chart_html(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False, config={'displaylogo': False})
+
+
+def report_files(report_id, formats):
+    files = [f"{report_id}.html"] if 'html' in formats else []
+    files += [f"{report_id}_{chart}.{fmt}" for fmt in formats if fmt in IMAGE_FORMATS for chart in CHARTS]
+    return files
+
+
+def render_report(job):
+    report_id, view, label, out_dir, formats = job
+    started = time.perf_counter()
+    date_range = (view.start, view.end)
+    platforms = list(view.platforms) if view.platforms is not None else _backend.dimension_values('platform')
+    states = list(view.states) if view.states is not None else _backend.dimension_values('state')
+
+    kpis = aggregates.kpi_summary(_backend, view.start, view.end)
+    platform_chart, platform_summary = _dashboard.create_platform_analysis(_backend, date_range, platforms, states)
+    charts = {
+        'trends_chart': _dashboard.create_revenue_trends_chart(_backend, date_range),
+        'platform_chart': platform_chart,
+        'tactic_chart': _dashboard.create_tactic_analysis(_backend, date_range, platforms, states)[0],
+        'weekly_chart': _dashboard.create_weekly_analysis(_backend, date_range)[0],
+    }
+    for fig in charts.values():
+        compact_figure(fig)
+
+    if 'html' in formats:
+        sections = [
+            ("Performance Trends", _chart_html(charts['trends_chart'])),
+            ("Platform Performance", _chart_html(charts['platform_chart']) +
+             platform_summary.round(2).to_html(index=False, classes='summary', border=0)),
+            ("Tactic Performance", _chart_html(charts['tactic_chart'])),
+            ("Weekly Performance Patterns", _chart_html(charts['weekly_chart'])),
+        ]
+        body = ''.join(f"<h2>{title}</h2>\n{content}\n" for title, content in sections)
+        document = (
+            f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            f'<title>Marketing Report | {html.escape(label)}</title>\n'
+            f'<script src="{PLOTLY_JS}"></script>\n<style>{REPORT_STYLE}</style>\n</head>\n<body>\n'
+            f'<h1>Marketing Intelligence Report</h1>\n<p class="filters">{html.escape(label)}</p>\n'
+            f'<div class="kpis">{_kpi_html(_dashboard.kpi_cards(kpis))}</div>\n{body}</body>\n</html>\n'
+        )
+        with open(os.path.join(out_dir, f"{report_id}.html"), 'w') as f:
+            f.write(document)
+
+    for fmt in formats:
+        if fmt in IMAGE_FORMATS:
+            for name, fig in charts.items():
+                fig.write_image(os.path.join(out_dir, f"{report_id}_{name}.{fmt}"), format=fmt, width=1200)
+
+    return report_id, time.perf_counter() - started
+
+
+def _write_index(out_dir, manifest, requested, reports):
+    rows = ''.join(
+        f'<tr><td>{html.escape(name)}</td><td><a href="{report_id}.html">{html.escape(reports[report_id])}</a></td></tr>\n'
+        for name, report_id in requested
+    )
+    with open(os.path.join(out_dir, 'index.html'), 'w') as f:
+        f.write(
+            f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>Marketing Reports</title>\n'
+            f'<style>{REPORT_STYLE}</style>\n</head>\n<body>\n<h1>Marketing Reports</h1>\n'
+            f'<p class="filters">Snapshot {manifest["snapshot"]}</p>\n'
+            f'<table class="summary">\n{rows}</table>\n</body>\n</html>\n'
+        )
+
+
+def render_reports(views=None, root=PROCESSED_ROOT, out_root=REPORTS_ROOT, formats=('html',), workers=None, force=False):
+    if kaleido is None and any(fmt in IMAGE_FORMATS for fmt in formats):
+        raise SystemExit("kaleido is not installed; pip install kaleido to export PNG or PDF")
+
+    manifest = read_manifest(root)
+    # Reports are written per snapshot, so an unchanged snapshot never
+    # re-renders a report that is already on disk
+    out_dir = os.path.join(out_root, manifest['snapshot'])
+    os.makedirs(out_dir, exist_ok=True)
+    if 'html' in formats and not os.path.exists(os.path.join(out_dir, PLOTLY_JS)):
+        with open(os.path.join(out_dir, PLOTLY_JS), 'w') as f:
+            f.write(plotly.offline.get_plotlyjs())
+
+    name = segment_name(manifest['version'], REPORT_NAMESPACE)
+    frames, _ = attach_or_publish(manifest, namespace=REPORT_NAMESPACE)
+    try:
+        backend = PandasBackend(frames['business'], frames['marketing'], frames['campaigns'])
+        bounds = backend.date_bounds()
+        dimensions = {dim: backend.dimension_values(dim) for dim in ('platform', 'state')}
+        if views is None:
+            views = default_views(bounds, dimensions)
+
+        requested = []
+        reports = {}
+        for view_name, start, end, platforms, states in views:
+            view = normalize_view(start, end, platforms, states, bounds, dimensions)
+            report_id = view_id(view)
+            label = view_label(view)
+            requested.append((view_name or label, report_id))
+            reports.setdefault(report_id, (view, label))
+
+        pending = [
+            (report_id, view, label, out_dir, formats) for report_id, (view, label) in reports.items()
+            if force or not all(os.path.exists(os.path.join(out_dir, file)) for file in report_files(report_id, formats))
+        ]
+
+        started = time.perf_counter()
+        workers = min(workers or get_workers(), max(len(pending), 1))
+        if not pending:
+            results = []
+        elif workers == 1:
+            _init_worker(name)
+            results = [render_report(job) for job in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(name,)) as executor:
+                results = list(executor.map(render_report, pending, chunksize=max(1, len(pending) // (workers * 4))))
+        elapsed = time.perf_counter() - started
+    finally:
+        # Unlinking only removes the name; this process's mapping goes when it exits
+        unlink_version(manifest['version'], REPORT_NAMESPACE)
+
+    if 'html' in formats:
+        _write_index(out_dir, manifest, requested, {report_id: label for report_id, (_, label) in reports.items()})
+
+    render_seconds = sum(seconds for _, seconds in results)
+    print(f"{len(requested)} views requested, {len(reports)} distinct, {len(results)} rendered "
+          f"in {elapsed:.1f}s on {workers} workers ({render_seconds / max(len(results), 1):.2f}s per report)")
+    print(f"Reports written to {out_dir}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render static dashboard reports for many date range and filter combinations")
+    parser.add_argument('--views', default=None,
+                        help="JSON list of {name, start, end, platforms, states}; default: standard windows and "
+                             "calendar months for all, each platform and each state")
+    parser.add_argument('--root', default=PROCESSED_ROOT)
+    parser.add_argument('--out', default=REPORTS_ROOT)
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['html'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Re-render reports already written for this snapshot")
+    args = parser.parse_args()
+
+    render_reports(read_views(args.views) if args.views else None, args.root, args.out,
+                   tuple(args.formats), args.workers, args.force)
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from kpis import KPI_REGISTRY, kpi_components
+
+WINDOWS = (7, 28)
+WOW_LAG = 7
+ANOMALY_WINDOW = 28
+ANOMALY_THRESHOLD = 3.5
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+TOTAL_METRICS = ['total_revenue', 'spend', 'total_roas', 'total_ctr']
+PLATFORM_METRICS = ['attributed_revenue', 'spend', 'roas', 'ctr']
+
+# Every statistic for a day only looks this many rows back, so appending days
+# only requires recomputing from this far before the first new day
+LOOKBACK = max(max(WINDOWS), 2 * WOW_LAG, ANOMALY_WINDOW)
+
+
+def stat_columns(metric):
+    return [f"{metric}_ma{window}" for window in WINDOWS] + [f"{metric}_wow", f"{metric}_z", f"{metric}_anomaly"]
+
+
+def metric_inputs(metrics):
+    columns = []
+    for metric in metrics:
+        for col in (kpi_components([metric]) if metric in KPI_REGISTRY else [metric]):
+            if col not in columns:
+                columns.append(col)
+    return columns
+
+
+def _rolling_sum(values, window):
+    # Prefix sums give every window total in one vectorized pass
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    sums = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    values = np.zeros(len(numerator))
+    np.divide(numerator * scale, denominator, out=values, where=denominator > 0)
+    return np.where(np.isnan(denominator), np.nan, values)
+
+
+def _lagged(values, lag):
+    lagged = np.full(len(values), np.nan)
+    lagged[lag:] = values[:-lag]
+    return lagged
+
+
+def _robust_z(values, window=ANOMALY_WINDOW):
+    # Each day is scored against the median and MAD of the preceding window,
+    # so a spike does not mask itself
+    z = np.full(len(values), np.nan)
+    if len(values) <= window:
+        return z
+
+    history = sliding_window_view(values[:-1], window)
+    median = np.median(history, axis=1)
+    mad = np.median(np.abs(history - median[:, None]), axis=1) * MAD_SCALE
+
+    deviation = values[window:] - median
+    scored = np.zeros(len(deviation))
+    np.divide(deviation, mad, out=scored, where=mad > 0)
+    z[window:] = scored
+    return z
+
+
+def _metric_stats(df, metric):
+    if metric in KPI_REGISTRY:
+        kpi = KPI_REGISTRY[metric]
+        numerator = df[kpi.numerator].to_numpy(dtype='float64')
+        denominator = df[kpi.denominator].to_numpy(dtype='float64')
+        daily = _ratio(numerator, denominator, kpi.scale)
+        # Ratios are smoothed as ratios of rolling sums, matching how KPIs aggregate
+        averages = [
+            _ratio(_rolling_sum(numerator, window), _rolling_sum(denominator, window), kpi.scale)
+            for window in WINDOWS
+        ]
+    else:
+        daily = df[metric].to_numpy(dtype='float64')
+        averages = [_rolling_sum(daily, window) / window for window in WINDOWS]
+
+    weekly = averages[WINDOWS.index(WOW_LAG)] if WOW_LAG in WINDOWS else _rolling_sum(daily, WOW_LAG) / WOW_LAG
+    previous_week = _lagged(weekly, WOW_LAG)
+    wow = np.full(len(weekly), np.nan)
+    np.divide(weekly - previous_week, previous_week, out=wow, where=previous_week > 0)
+
+    z = _robust_z(daily)
+    columns = stat_columns(metric)
+    stats = dict(zip(columns, averages + [wow * 100, z]))
+    stats[columns[-1]] = np.abs(np.nan_to_num(z)) > ANOMALY_THRESHOLD
+    return stats
+
+
+def compute_rolling_stats(df, metrics):
+    stats = {}
+    for metric in metrics:
+        stats.update(_metric_stats(df, metric))
+    return pd.DataFrame(stats, index=df.index)
+
+
+def _unchanged_rows(df, previous, inputs):
+    # Number of leading days whose inputs match the previous run, i.e. days
+    # whose statistics can be reused as-is
+    if previous is None or any(col not in previous.columns for col in inputs):
+        return 0
+
+    n = min(len(df), len(previous))
+    same = df['date'].to_numpy()[:n] == previous['date'].to_numpy()[:n]
+    for col in inputs:
+        same &= np.isclose(
+            df[col].to_numpy(dtype='float64')[:n], previous[col].to_numpy(dtype='float64')[:n], equal_nan=True
+        )
+
+    changed = np.flatnonzero(~same)
+    return int(changed[0]) if len(changed) else n
+
+
+def _series_stats(df, metrics, previous):
+    inputs = metric_inputs(metrics)
+    reused = _unchanged_rows(df, previous, inputs)
+    columns = [col for metric in metrics for col in stat_columns(metric)]
+
+    if reused and all(col in previous.columns for col in columns):
+        start = max(0, reused - LOOKBACK)
+        fresh = compute_rolling_stats(df.iloc[start:], metrics).iloc[reused - start:]
+        kept = previous[columns].iloc[:reused].set_axis(df.index[:reused])
+        return pd.concat([kept, fresh])
+
+    return compute_rolling_stats(df, metrics)
+
+
+def add_rolling_stats(df, metrics, by=None, previous=None):
+    # df holds one row per day (per `by` group). When `previous` is the output
+    # of an earlier run, unchanged days keep their statistics and only the
+    # appended days are recomputed.
+    df = df.sort_values((by or []) + ['date']).reset_index(drop=True)
+    stat_names = [col for metric in metrics for col in stat_columns(metric)]
+    base = df.drop(columns=[col for col in stat_names if col in df.columns])
+
+    if previous is not None:
+        previous = previous.sort_values((by or []) + ['date']).reset_index(drop=True)
+
+    if by is None:
+        return pd.concat([base, _series_stats(base, metrics, previous)], axis=1)
+
+    previous_groups = dict(tuple(previous.groupby(by, sort=False))) if previous is not None else {}
+    stats = [
+        _series_stats(group, metrics, previous_groups.get(key))
+        for key, group in base.groupby(by, sort=False)
+    ]
+    return pd.concat([base, pd.concat(stats)], axis=1)
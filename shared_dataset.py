@@ -0,0 +1,153 @@
+import json
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data_storage import read_dataset
+
+SEGMENT_PREFIX = 'mktdash'
+ALIGNMENT = 64
+HEADER = struct.Struct('<QQ')
+READY = 1
+ATTACH_TIMEOUT_SECONDS = 60.0
+
+
+def segment_name(version, namespace=None):
+    return f"{SEGMENT_PREFIX}_{namespace}_{version}" if namespace else f"{SEGMENT_PREFIX}_{version}"
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _untrack(shm):
+    # On Python < 3.13 every process that opens a segment registers it with
+    # its resource tracker, which unlinks it when that process exits. The
+    # segment must outlive any single worker, so lifetime is managed here.
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _encode_column(series):
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_dtype(series):
+        return series.to_numpy(), None
+
+    # Strings are dictionary-encoded; only the small category list goes into the metadata
+    categorical = pd.Categorical(series)
+    return np.ascontiguousarray(categorical.codes), categorical.categories.tolist()
+
+
+def _layout(frames):
+    columns = {}
+    buffers = []
+    offset = 0
+
+    for frame_name, df in frames.items():
+        specs = []
+        for col in df.columns:
+            array, categories = _encode_column(df[col])
+            offset = _align(offset)
+            specs.append({
+                'name': col,
+                'dtype': array.dtype.str,
+                'offset': offset,
+                'length': int(len(array)),
+                'categories': categories
+            })
+            buffers.append((offset, array))
+            offset += array.nbytes
+        columns[frame_name] = {'rows': int(len(df)), 'columns': specs}
+
+    return columns, buffers, offset
+
+
+def publish_frames(name, frames):
+    metadata, buffers, data_size = _layout(frames)
+    metadata_bytes = json.dumps(metadata).encode('utf-8')
+    data_start = _align(HEADER.size + len(metadata_bytes))
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(data_start + data_size, 1))
+    _untrack(shm)
+
+    shm.buf[HEADER.size:HEADER.size + len(metadata_bytes)] = metadata_bytes
+    for offset, array in buffers:
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=data_start + offset)
+        target[:] = array
+        del target
+
+    # The ready flag is written last so attaching workers never see a partial segment
+    HEADER.pack_into(shm.buf, 0, READY, len(metadata_bytes))
+    return shm
+
+
+def _read_header(shm, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        ready, metadata_length = HEADER.unpack_from(shm.buf, 0)
+        if ready == READY:
+            return metadata_length
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Shared dataset {shm.name} was never marked ready")
+        time.sleep(0.05)
+
+
+def attach_frames(name, timeout=ATTACH_TIMEOUT_SECONDS):
+    shm = shared_memory.SharedMemory(name=name)
+    _untrack(shm)
+
+    metadata_length = _read_header(shm, timeout)
+    metadata = json.loads(bytes(shm.buf[HEADER.size:HEADER.size + metadata_length]))
+    data_start = _align(HEADER.size + metadata_length)
+
+    frames = {}
+    for frame_name, frame_meta in metadata.items():
+        data = {}
+        for spec in frame_meta['columns']:
+            array = np.ndarray(
+                (spec['length'],), dtype=np.dtype(spec['dtype']),
+                buffer=shm.buf, offset=data_start + spec['offset']
+            )
+            array.flags.writeable = False
+
+            if spec['categories'] is not None:
+                data[spec['name']] = pd.Categorical.from_codes(array, spec['categories'])
+            else:
+                data[spec['name']] = array
+
+        # copy=False keeps every column a view onto the shared segment
+        frames[frame_name] = pd.DataFrame(data, copy=False)
+
+    return frames, shm
+
+
+def attach_or_publish(manifest, datasets=('business', 'marketing', 'campaigns'), namespace=None):
+    name = segment_name(manifest['version'], namespace)
+
+    try:
+        return attach_frames(name)
+    except FileNotFoundError:
+        pass
+
+    frames = {dataset: read_dataset(manifest, dataset) for dataset in datasets}
+    try:
+        publish_frames(name, frames)
+    except FileExistsError:
+        # Another worker published the same version first
+        pass
+    return attach_frames(name)
+
+
+def unlink_version(version, namespace=None):
+    # Unlinking only removes the name; workers already attached keep their mapping
+    try:
+        shm = shared_memory.SharedMemory(name=segment_name(version, namespace))
+    except FileNotFoundError:
+        return False
+    shm.unlink()
+    shm.close()
+    return True
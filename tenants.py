@@ -0,0 +1,173 @@
+import argparse
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from data_storage import PROCESSED_ROOT, IncompatibleSnapshot, current_snapshot, read_dataset, read_manifest
+from query_backend import SQLITE_PATH, PandasBackend
+from shared_dataset import attach_or_publish
+
+TENANTS_ROOT = 'tenants'
+DATA_DIR = 'Data'
+TENANT_ENV_VAR = 'DASHBOARD_TENANT'
+TENANT_QUERY_PARAM = 'tenant'
+CACHE_BUDGET_ENV_VAR = 'DATASET_CACHE_MB'
+DEFAULT_CACHE_BUDGET_MB = 1024
+
+# Tenant ids become directory and shared memory segment names
+TENANT_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]{0,63}')
+
+TenantPaths = namedtuple('TenantPaths', ['data_dir', 'root', 'sqlite_path'])
+CacheEntry = namedtuple('CacheEntry', ['version', 'backend', 'nbytes'])
+
+
+def validate_tenant(tenant):
+    if tenant is not None and not TENANT_PATTERN.fullmatch(tenant):
+        raise ValueError(f"Invalid tenant id '{tenant}'. Use letters, digits, '-' and '_'")
+    return tenant
+
+
+def get_default_tenant():
+    return validate_tenant(os.getenv(TENANT_ENV_VAR, '').strip() or None)
+
+
+def tenant_paths(tenant=None):
+    # No tenant is the original single-brand layout, so existing deployments
+    # keep their Data/ and processed/ directories
+    if validate_tenant(tenant) is None:
+        return TenantPaths(DATA_DIR, PROCESSED_ROOT, SQLITE_PATH)
+    base = os.path.join(TENANTS_ROOT, tenant)
+    return TenantPaths(os.path.join(base, DATA_DIR), os.path.join(base, PROCESSED_ROOT), os.path.join(base, SQLITE_PATH))
+
+
+def list_tenants():
+    if not os.path.isdir(TENANTS_ROOT):
+        return []
+    return sorted(
+        name for name in os.listdir(TENANTS_ROOT)
+        if TENANT_PATTERN.fullmatch(name) and os.path.isdir(os.path.join(TENANTS_ROOT, name))
+    )
+
+
+def get_cache_budget():
+    return int(float(os.getenv(CACHE_BUDGET_ENV_VAR, DEFAULT_CACHE_BUDGET_MB)) * 1024 * 1024)
+
+
+def _frames_backend(frames):
+    nbytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+    return PandasBackend(frames['business'], frames['marketing'], frames['campaigns']), nbytes
+
+
+def load_backend(tenant, manifest):
+    return _frames_backend({name: read_dataset(manifest, name) for name in ('business', 'marketing', 'campaigns')})
+
+
+def load_shared_backend(tenant, manifest):
+    # The tenant is the segment namespace, so two tenants never attach to
+    # each other's data even when their versions collide
+    frames, segment = attach_or_publish(manifest, namespace=tenant)
+    backend, nbytes = _frames_backend(frames)
+    backend.segment = segment
+    return backend, nbytes
+
+
+class DatasetCache:
+    def __init__(self, budget_bytes=None, load=load_backend, on_evict=None):
+        self.budget_bytes = budget_bytes or get_cache_budget()
+        self.load = load
+        # Called with (tenant, entry) once a tenant leaves the cache, to
+        # release what the process holds for it beyond the frames
+        self.on_evict = on_evict
+
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def _tenant_lock(self, tenant):
+        with self._lock:
+            return self._loading.setdefault(tenant, threading.Lock())
+
+    def backend(self, tenant, manifest):
+        # A tenant is only loaded when first queried; concurrent sessions of
+        # the same tenant wait for one load instead of each reading it
+        with self._tenant_lock(tenant):
+            with self._lock:
+                entry = self._entries.get(tenant)
+                if entry is not None and entry.version == manifest['version']:
+                    self._entries.move_to_end(tenant)
+                    self.hits += 1
+                    return entry.backend
+
+            backend, nbytes = self.load(tenant, manifest)
+            with self._lock:
+                # A new version replaces the tenant's previous one
+                self._entries.pop(tenant, None)
+                self._entries[tenant] = CacheEntry(manifest['version'], backend, nbytes)
+                self.misses += 1
+                evicted = self._evict()
+        self._release(evicted)
+        return backend
+
+    def _evict(self):
+        # Least recently used tenants go first. The tenant just loaded is the
+        # most recent and always stays, even if it alone exceeds the budget.
+        # Sessions still holding an evicted backend keep it until they finish.
+        evicted = []
+        while len(self._entries) > 1 and self.nbytes > self.budget_bytes:
+            evicted.append(self._entries.popitem(last=False))
+            self.evictions += 1
+        return evicted
+
+    def _release(self, evicted):
+        if self.on_evict is not None:
+            for tenant, entry in evicted:
+                self.on_evict(tenant, entry)
+
+    def evict(self, tenant):
+        with self._lock:
+            entry = self._entries.pop(tenant, None)
+        if entry is not None:
+            self._release([(tenant, entry)])
+        return entry is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tenants': {tenant: entry.nbytes for tenant, entry in self._entries.items()},
+                'nbytes': self.nbytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List tenants and load their current datasets under a shared budget")
+    parser.add_argument('--budget-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    cache = DatasetCache(int(args.budget_mb * 1024 * 1024) if args.budget_mb else None)
+    for tenant in list_tenants():
+        paths = tenant_paths(tenant)
+        try:
+            manifest = read_manifest(paths.root)
+        except IncompatibleSnapshot as e:
+            print(f"{tenant}: {e}")
+            continue
+        except FileNotFoundError:
+            print(f"{tenant}: no processed data (run python data_processor.py --tenant {tenant})")
+            continue
+        cache.backend(tenant, manifest)
+        stats = cache.stats()
+        print(f"{tenant}: snapshot {current_snapshot(paths.root)}, {stats['tenants'][tenant] / 1e6:.1f} MB; "
+              f"cache holds {len(stats['tenants'])} tenants, {stats['nbytes'] / 1e6:.1f} of "
+              f"{stats['budget_bytes'] / 1e6:.1f} MB ({stats['evictions']} evicted)")
@@ -1,25 +1,226 @@
-import pandas as pd 
-
-def verify_data_files() :
-    files = ['Data/business.csv', 'Data/Facebook.csv', 'Data/Google.csv', 'Data/TikTok.csv']
-
-    for file in files: 
-        try:
-            df = pd.read_csv(file)
-            print(f"\n{file}:")
-            print(f"    Shape: {df.shape}")
-            print(f"    Columns: {list(df.columns)}")
-            print(f"    Date range: {df['date'].min()} to {df['date'].max()}")
-
-            if 'tactic' in df.columns:
-                print(f"    Tactics: {df['tactic'].unique()}")
-            
-            if 'state' in df.columns:
-                print(f"    States: {df['state'].unique()}")
-            
-        except Exception as e:
-                print(f"Error reading {file}: {e}")
-
-if __name__ == "__main__" : 
-     verify_data_files()
-            
\ No newline at end of file
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DATA_FILES = ['Data/business.csv', 'Data/Facebook.csv', 'Data/Google.csv', 'Data/TikTok.csv']
+CACHE_PATH = '.validation_cache.json'
+
+# Bump when rules change so cached results from older rules are not reused
+RULES_VERSION = 1
+
+NULL_RATE_THRESHOLD = 0.01
+
+MARKETING_SCHEMA = {
+    'date': 'date',
+    'tactic': 'string',
+    'state': 'string',
+    'campaign': 'string',
+    'impression': 'numeric',
+    'clicks': 'numeric',
+    'spend': 'numeric',
+    'attributed revenue': 'numeric'
+}
+
+BUSINESS_SCHEMA = {
+    'date': 'date',
+    '# of orders': 'numeric',
+    '# of new orders': 'numeric',
+    'new customers': 'numeric',
+    'total revenue': 'numeric',
+    'gross profit': 'numeric',
+    'COGS': 'numeric'
+}
+
+NON_NEGATIVE = {
+    'marketing': ['impression', 'clicks', 'spend', 'attributed revenue'],
+    'business': ['# of orders', '# of new orders', 'new customers', 'total revenue', 'COGS']
+}
+
+
+def _file_kind(path):
+    return 'business' if os.path.basename(path).lower().startswith('business') else 'marketing'
+
+
+def _schema_for(kind):
+    return BUSINESS_SCHEMA if kind == 'business' else MARKETING_SCHEMA
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _issue(rule, severity, message, rows=0):
+    return {'rule': rule, 'severity': severity, 'message': message, 'rows': int(rows)}
+
+
+def validate_file(path):
+    kind = _file_kind(path)
+    schema = _schema_for(kind)
+
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    missing = [col for col in schema if col not in header]
+    extra = [col for col in header if col not in schema]
+
+    issues = []
+    if missing:
+        issues.append(_issue('schema', 'error', f"Missing columns: {missing}"))
+    if extra:
+        issues.append(_issue('schema', 'warning', f"Unexpected columns: {extra}"))
+
+    # Only the columns the rules need are parsed, all as strings so that type
+    # problems are reported rather than raised
+    usecols = [col for col in schema if col in header]
+    raw = pd.read_csv(path, usecols=usecols, dtype=str, keep_default_na=True)
+    rows = len(raw)
+
+    null_counts = raw.isna().sum()
+    for col, count in null_counts.items():
+        if rows and count / rows > NULL_RATE_THRESHOLD:
+            issues.append(_issue('null_rate', 'warning', f"{col}: {count / rows:.1%} null", count))
+
+    numeric = {}
+    for col, kind_name in schema.items():
+        if col not in raw.columns or kind_name != 'numeric':
+            continue
+        values = pd.to_numeric(raw[col], errors='coerce')
+        invalid = int((values.isna() & raw[col].notna()).sum())
+        if invalid:
+            issues.append(_issue('type', 'error', f"{col}: {invalid} non-numeric values", invalid))
+        numeric[col] = values.to_numpy(dtype='float64')
+
+    for col in NON_NEGATIVE[kind]:
+        if col in numeric:
+            negative = int(np.count_nonzero(numeric[col] < 0))
+            if negative:
+                issues.append(_issue('negative', 'error', f"{col}: {negative} negative values", negative))
+
+    if 'clicks' in numeric and 'impression' in numeric:
+        over = int(np.count_nonzero(numeric['clicks'] > numeric['impression']))
+        if over:
+            issues.append(_issue('clicks_gt_impressions', 'error', f"{over} rows with clicks > impressions", over))
+
+    summary = {'rows': rows, 'columns': len(header)}
+
+    if 'date' in raw.columns:
+        dates = pd.to_datetime(raw['date'], errors='coerce', format='%Y-%m-%d')
+        invalid = int((dates.isna() & raw['date'].notna()).sum())
+        if invalid:
+            issues.append(_issue('type', 'error', f"date: {invalid} unparseable values", invalid))
+
+        unique_days = np.unique(dates.dropna().to_numpy(dtype='datetime64[D]'))
+        if len(unique_days):
+            summary['min_date'] = str(unique_days[0])
+            summary['max_date'] = str(unique_days[-1])
+
+            expected_days = int((unique_days[-1] - unique_days[0]).astype(int)) + 1
+            missing_days = expected_days - len(unique_days)
+            if missing_days:
+                gaps = int(np.count_nonzero(np.diff(unique_days).astype(int) > 1))
+                issues.append(_issue(
+                    'date_gaps', 'warning', f"{missing_days} missing days across {gaps} gaps", missing_days
+                ))
+
+    return {
+        'file': path,
+        'valid': not any(issue['severity'] == 'error' for issue in issues),
+        'summary': summary,
+        'issues': issues
+    }
+
+
+def _validate_safely(path):
+    # A file that cannot be read is reported like any other failed rule, so
+    # one bad file does not abort validation of the rest
+    try:
+        return validate_file(path), True
+    except Exception as e:
+        return {
+            'file': path, 'valid': False, 'summary': {},
+            'issues': [_issue('read', 'error', f"Error reading file: {e}")]
+        }, False
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return cache if cache.get('rules_version') == RULES_VERSION else {}
+
+
+def _save_cache(cache_path, cache):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def validate_data_files(files=DATA_FILES, cache_path=CACHE_PATH, max_workers=None, use_cache=True):
+    cache = _load_cache(cache_path) if use_cache else {}
+    cached_files = cache.get('files', {})
+
+    hashes = {}
+    results = {}
+    pending = []
+
+    for path in files:
+        if not os.path.exists(path):
+            results[path] = {
+                'file': path, 'valid': False, 'summary': {}, 'cached': False,
+                'issues': [_issue('missing_file', 'error', 'File not found')]
+            }
+            continue
+
+        hashes[path] = file_hash(path)
+        entry = cached_files.get(path)
+        if entry and entry['hash'] == hashes[path]:
+            results[path] = dict(entry['result'], cached=True)
+        else:
+            pending.append(path)
+
+    if pending:
+        workers = max_workers or min(len(pending), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, (result, cacheable) in zip(pending, executor.map(_validate_safely, pending)):
+                results[path] = dict(result, cached=False)
+                # Read errors may be transient (a file mid-write), so they are retried next run
+                if cacheable:
+                    cached_files[path] = {'hash': hashes[path], 'result': result}
+
+        if use_cache:
+            _save_cache(cache_path, {'rules_version': RULES_VERSION, 'files': cached_files})
+
+    return [results[path] for path in files]
+
+
+def verify_data_files(files=DATA_FILES):
+    results = validate_data_files(files)
+
+    for result in results:
+        status = 'OK' if result['valid'] else 'FAILED'
+        source = ' (cached)' if result['cached'] else ''
+        print(f"\n{result['file']}: {status}{source}")
+
+        summary = result['summary']
+        if summary:
+            print(f"    Rows: {summary['rows']} | Columns: {summary['columns']}")
+            if 'min_date' in summary:
+                print(f"    Date range: {summary['min_date']} to {summary['max_date']}")
+
+        for issue in result['issues']:
+            print(f"    [{issue['severity']}] {issue['rule']}: {issue['message']}")
+
+    return all(result['valid'] for result in results)
+
+if __name__ == "__main__" :
+     if not verify_data_files():
+         raise SystemExit(1)